@@ -6,6 +6,9 @@ from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHB
     QLineEdit, QLabel, QPushButton, QFileDialog
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 from PyQt5.QtGui import QIcon
+from playlist_dedup import Deduplicator
+from hearthis_api import API_CACHE_TTL, get_json, media_url
+from playlist_loader import PlaylistLoader
 
 class Signal(QObject):
     update_playlist_signal = pyqtSignal(list)
@@ -101,39 +104,35 @@ class HearThisPlayer(QMainWindow):
             "count": 20
         }
 
-        response = requests.get(hearthis_api_url, params=params)
+        try:
+            # Through the shared cache: another player that just loaded this page saves us the request.
+            data = get_json(hearthis_api_url, params, cache_ttl=API_CACHE_TTL)
+        except requests.RequestException as e:
+            print(f"Failed to load tracks for {self.artist_username} on page {page}: {e}")
+            return []
 
-        if response.status_code == 200:
-            data = response.json()
+        if data:
+            tracks = data
+            playlist_data = []
 
-            if data:
-                tracks = data
-                playlist_data = []
+            for track in tracks:
+                title = track["title"]
+                url = track["stream_url"]
 
-                for track in tracks:
-                    title = track["title"]
-                    url = track["stream_url"]
+                playlist_data.append((title, url))
 
-                    item = QListWidgetItem(title)
-                    media_content = QMediaContent(QUrl(url))
-                    item.setData(Qt.UserRole, media_content)
-                    playlist_data.append((title, media_content))
+            # Emituj sygnał do aktualizacji listy
+            self.signal.update_playlist_signal.emit(playlist_data)
 
-                # Emituj sygnał do aktualizacji listy
-                self.signal.update_playlist_signal.emit(playlist_data)
+            print(f"Loaded page {page} for {self.artist_username}")
 
-                print(f"Loaded page {page} for {self.artist_username}")
+            # Aktualizacja etykiety strony
+            self.page_label.setText(f"Page: {page}")
 
-                # Aktualizacja etykiety strony
-                self.page_label.setText(f"Page: {page}")
-
-                return playlist_data
-
-            else:
-                print(f"No more tracks found for {self.artist_username} on page {page}.")
+            return playlist_data
 
         else:
-            print(f"Failed to load tracks for {self.artist_username} on page {page}. Status code: {response.status_code}")
+            print(f"No more tracks found for {self.artist_username} on page {page}.")
 
         return []
 
@@ -155,17 +154,20 @@ class HearThisPlayer(QMainWindow):
                 self.page += 1
 
     def update_playlist(self, data):
-        for title, _ in data:
+        self.playlist.setUpdatesEnabled(False)
+        for title, url in data:
             item = QListWidgetItem(title)
+            item.setData(Qt.UserRole, url)
             self.playlist.addItem(item)
+        self.playlist.setUpdatesEnabled(True)
 
     def play_track(self, item):
         if self.player.state() == QMediaPlayer.PlayingState:
             self.player.stop()
 
         self.current_playlist_index = self.playlist.row(item)
-        media_content = item.data(Qt.UserRole)
-        self.player.setMedia(media_content)
+        url = item.data(Qt.UserRole)
+        self.player.setMedia(QMediaContent(QUrl(media_url(url))))
         self.player.play()
 
     def toggle_play(self):
@@ -187,11 +189,13 @@ class HearThisPlayer(QMainWindow):
         file_path, _ = QFileDialog.getSaveFileName(self, "Save Playlist", "", "Text Files (*.txt);;All Files (*)")
 
         if file_path:
+            dedup = Deduplicator()
             with open(file_path, "w") as file:
-                for title, media_content in self.local_playlist:
-                    file.write(f"{title}\t{media_content.canonicalUrl().toString()}\n")
+                for title, url in self.local_playlist:
+                    if dedup.is_new(url):
+                        file.write(f"{title}\t{url}\n")
 
-            print(f"Playlist saved to {file_path}")
+            print(f"Playlist saved to {file_path} ({dedup.duplicates} duplicates skipped)")
 
     def load_playlist(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Load Playlist", "", "Text Files (*.txt);;All Files (*)")
@@ -200,16 +204,41 @@ class HearThisPlayer(QMainWindow):
             self.playlist.clear()
             self.local_playlist.clear()
 
-            with open(file_path, "r") as file:
-                for line in file:
-                    title, url = line.strip().split("\t")
-                    media_content = QMediaContent(QUrl(url))
-                    item = QListWidgetItem(title)
-                    item.setData(Qt.UserRole, media_content)
-                    self.local_playlist.append((title, media_content))
-                    self.playlist.addItem(item)
+            self.stop_playlist_loader()
+
+            # Parsowanie w tle; wiersze trafiają do listy partiami
+            self.playlist_loader = PlaylistLoader(file_path, parent=self)
+            self.playlist_loader.rows_loaded.connect(self.add_loaded_rows)
+            self.playlist_loader.loading_finished.connect(
+                lambda loaded, duplicates, skipped: self.playlist_loaded(file_path, loaded, duplicates, skipped))
+            self.playlist_loader.start()
+
+    def stop_playlist_loader(self):
+        loader = getattr(self, "playlist_loader", None)
+        if loader:
+            loader.rows_loaded.disconnect()
+            loader.loading_finished.disconnect()
+            loader.requestInterruption()
+            # A QThread must not be destroyed while running; it stops at its next batch.
+            loader.wait()
+            loader.deleteLater()
+            self.playlist_loader = None
+
+    def add_loaded_rows(self, rows):
+        if self.sender() is not self.playlist_loader:
+            # A batch queued by a loader that has since been replaced.
+            return
+        self.local_playlist.extend(rows)
+        self.update_playlist(rows)
+
+    def closeEvent(self, event):
+        self.stop_playlist_loader()
+        super().closeEvent(event)
 
-            print(f"Playlist loaded from {file_path}")
+    def playlist_loaded(self, file_path, loaded, duplicates, skipped):
+        for line_no, line in skipped[:10]:
+            print(f"Skipped malformed line {line_no}: {line[:80]!r}")
+        print(f"Playlist loaded from {file_path}: {loaded} tracks, {duplicates} duplicates, {len(skipped)} malformed lines skipped")
 
     def media_status_changed(self, status):
         if status == QMediaPlayer.EndOfMedia:
@@ -3,33 +3,29 @@ import requests
 import json
 import time
 from pathlib import Path
-from qtpy.QtCore import Qt, QUrl, Signal, QTimer, QTime, QThread
+from qtpy.QtCore import Qt, QUrl, Signal, QTimer, QTime, QThread, QLineF, QObject
 from qtpy.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QListWidget, QListWidgetItem, QLineEdit, QLabel, QPushButton,
     QSlider, QComboBox, QTextBrowser, QTabWidget, QToolBar, QAction,
-    QProgressBar
+    QProgressBar, QSpinBox
 )
 from qtpy.QtMultimedia import QMediaPlayer, QMediaContent
-from qtpy.QtGui import QIcon, QPixmap, QTextDocument, QTextOption
+from qtpy.QtGui import QIcon, QPixmap, QTextDocument, QTextOption, QPainter, QPen, QColor
 from concurrent.futures import ThreadPoolExecutor
-
-class GenreCache:
-    def __init__(self, cache_dir=".genre_cache"):
-        self.cache_dir = Path(cache_dir)
-        self.cache_dir.mkdir(exist_ok=True)
-
-    def get(self, genre, page):
-        cache_file = self.cache_dir / f"{genre}_page{page}.json"
-        if cache_file.exists():
-            with cache_file.open("r") as f:
-                return json.load(f)
-        return None
-
-    def set(self, genre, page, data):
-        cache_file = self.cache_dir / f"{genre}_page{page}.json"
-        with cache_file.open("w") as f:
-            json.dump(data, f)
+from playback import PROFILES, ThroughputEstimator, StallTracker, probe_stream, prefetch_range, track_duration_ms
+from qos import QoSRecorder
+from track_catalog import TrackCatalog, parse_query
+from genre_mix import GenreMix, SORT_KEYS
+from search_pager import SearchPager
+from page_window import WindowedList
+from hearthis_api import API_BASE, API_CACHE_TTL, decode_tracks, get_json, media_url, project_tracks
+from genre_cache import GenreCache
+from cache_warmer import CacheWarmer
+from session_store import save_session, load_session
+from waveform import WaveformCache, fetch_waveform, downsample
+
+SESSION_PATH = ".session.bin"
 
 class GenreLoader(QThread):
     tracks_loaded = Signal(list)
@@ -45,23 +41,61 @@ class GenreLoader(QThread):
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                genre_api_url = f"https://api-v2.hearthis.at/categories/{self.genre}/"
+                genre_api_url = f"{API_BASE}/categories/{self.genre}/"
                 params = {
                     "page": self.page,
                     "count": self.count,
                 }
                 response = requests.get(genre_api_url, params=params, timeout=20)
                 response.raise_for_status()
-                genre_tracks = response.json()
+                genre_tracks = decode_tracks(response.content)
                 self.tracks_loaded.emit(genre_tracks)
                 break
-            except requests.RequestException as e:
+            except (requests.RequestException, ValueError) as e:
                 if attempt < max_retries - 1:
                     print(f"Error loading genre tracks (attempt {attempt + 1}): {e}. Retrying...")
                     time.sleep(1)  # Wait before retrying
                 else:
                     self.error_occurred.emit(f"Failed to load genre tracks after {max_retries} attempts: {e}")
 
+class GenreMixLoader(QThread):
+    rows_loaded = Signal(list)
+    mix_finished = Signal(int, int)
+
+    def __init__(self, genres, order, count, batch_size=20):
+        super().__init__()
+        self.mix = GenreMix(genres, order, count=count)
+        self.batch_size = batch_size
+
+    def run(self):
+        merged = 0
+        batch = []
+        for track in self.mix:
+            if self.isInterruptionRequested():
+                return
+            batch.append(track)
+            if len(batch) >= self.batch_size:
+                merged += len(batch)
+                self.rows_loaded.emit(batch)
+                batch = []
+        if batch:
+            merged += len(batch)
+            self.rows_loaded.emit(batch)
+        self.mix_finished.emit(merged, self.mix.duplicates)
+
+class CacheWarmerThread(QThread):
+    warm_finished = Signal(dict)
+
+    def __init__(self, warmer, genres, should_continue):
+        super().__init__()
+        self.warmer = warmer
+        self.genres = genres
+        self.should_continue = should_continue
+
+    def run(self):
+        stats = self.warmer.warm(self.genres, lambda: self.should_continue() and not self.isInterruptionRequested())
+        self.warm_finished.emit(stats)
+
 class GenreSelector(QWidget):
     genre_selected = Signal(str)
 
@@ -71,22 +105,115 @@ class GenreSelector(QWidget):
         self.genre_combo = QComboBox(self)
         self.genre_combo.currentIndexChanged.connect(self.emit_genre_selected)
 
+        self.mix_list = QListWidget(self)
+        self.mix_list.setFixedHeight(80)
+
         layout = QVBoxLayout(self)
         layout.addWidget(QLabel("Select Genre:"))
         layout.addWidget(self.genre_combo)
+        layout.addWidget(QLabel("Genres to mix:"))
+        layout.addWidget(self.mix_list)
 
     def set_genres(self, genres):
         self.genre_combo.clear()
         self.genre_combo.addItems(genres)
+        self.mix_list.clear()
+        for genre in genres:
+            item = QListWidgetItem(genre)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Unchecked)
+            self.mix_list.addItem(item)
+
+    def checked_genres(self):
+        return [self.mix_list.item(row).text() for row in range(self.mix_list.count())
+                if self.mix_list.item(row).checkState() == Qt.Checked]
 
     def emit_genre_selected(self):
         selected_genre = self.genre_combo.currentText()
         self.genre_selected.emit(selected_genre)
 
+class SeekScheduler(QObject):
+    seek_requested = Signal(int)
+    prefetch_requested = Signal(int)
+
+    def __init__(self, settle_ms=200, min_interval_ms=750, parent=None):
+        super().__init__(parent)
+        self.min_interval = min_interval_ms / 1000
+        self.pending = None
+        self.last_seek = 0.0
+        self.last_prefetch = 0.0
+
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(settle_ms)
+        self.settle_timer.timeout.connect(self.flush)
+
+    def request(self, position):
+        self.pending = position
+        now = time.monotonic()
+        if now - self.last_prefetch >= self.min_interval / 2:
+            self.last_prefetch = now
+            self.prefetch_requested.emit(position)
+        if now - self.last_seek >= self.min_interval:
+            self.flush()
+        else:
+            self.settle_timer.start()
+
+    def flush(self):
+        self.settle_timer.stop()
+        if self.pending is None:
+            return
+        position = self.pending
+        self.pending = None
+        self.last_seek = time.monotonic()
+        self.seek_requested.emit(position)
+
+class WaveformSlider(QSlider):
+    def __init__(self, orientation, parent=None):
+        super().__init__(orientation, parent)
+        self.samples = None
+        self.bars = []
+        self.setMinimumHeight(40)
+
+    def set_waveform(self, samples):
+        self.samples = samples
+        self.rebuild_bars()
+        self.update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.rebuild_bars()
+
+    def rebuild_bars(self):
+        # Only done on resize or new data, so periodic repaints just draw the cached lines.
+        self.bars = []
+        if self.samples is None:
+            return
+        middle = self.height() / 2
+        heights = downsample(self.samples, self.width()) * (middle - 1)
+        self.bars = [QLineF(x, middle - h, x, middle + h) for x, h in enumerate(heights.tolist())]
+
+    def paintEvent(self, event):
+        if self.bars:
+            span = self.maximum() - self.minimum()
+            played = int(len(self.bars) * (self.value() - self.minimum()) / span) if span > 0 else 0
+            painter = QPainter(self)
+            painter.setPen(QPen(QColor(70, 130, 180)))
+            painter.drawLines(self.bars[:played])
+            painter.setPen(QPen(QColor(170, 170, 170)))
+            painter.drawLines(self.bars[played:])
+            painter.end()
+        super().paintEvent(event)
+
 class HearThisPlayer(QMainWindow):
     update_playlist_signal = Signal(list)
     update_genres_signal = Signal(list)
     update_artist_info_signal = Signal(dict)
+    probe_finished = Signal(str, int, float, object)
+    waveform_loaded = Signal(str, object)
+    search_page_loaded = Signal(str, int, object)
+    artist_tracks_loaded = Signal(str, list)
+    genres_refreshed = Signal(list)
 
     def __init__(self):
         super().__init__()
@@ -105,8 +232,11 @@ class HearThisPlayer(QMainWindow):
         self.search_button.clicked.connect(self.search_artist)
         self.search_on_button = QPushButton("Search On", self)
         self.search_on_button.clicked.connect(self.search_on_hearthis)
+        self.search_catalog_button = QPushButton("Search Catalog", self)
+        self.search_catalog_button.clicked.connect(self.search_catalog)
 
         self.playlist = QListWidget(self)
+        self.playlist.setUniformItemSizes(True)
         self.playlist.currentItemChanged.connect(self.play_track)
 
         self.selected_tracks = QListWidget(self)
@@ -126,10 +256,44 @@ class HearThisPlayer(QMainWindow):
         self.artist_info_label.setFixedHeight(100)
 
         self.player = QMediaPlayer()
-        self.artist_username = ""
-        self.page = 1
+        self.player.bufferStatusChanged.connect(self.on_buffer_status)
+        self.player.mediaStatusChanged.connect(self.on_media_status)
+        self.player.setNotifyInterval(250)
+        self.player.positionChanged.connect(self.on_position_changed)
+        self.qos = QoSRecorder()
+        self.playback_profile = PROFILES["default"]
+        self.throughput = ThroughputEstimator()
+        self.stalls = StallTracker()
+        self.probe_executor = ThreadPoolExecutor(max_workers=2)
+        self.probe_finished.connect(self.on_probe_finished)
+        self.waveform_cache = WaveformCache()
+        self.waveform_loaded.connect(self.on_waveform_loaded)
+        self.catalog = TrackCatalog()
+        self.search_pager = SearchPager()
         self.local_playlist = []
         self.selected_playlist = []
+        # Search results page in as the list scrolls; only a few pages stay in memory, the rest spill to disk.
+        self.search_window = WindowedList(self.playlist, self.local_playlist, parent=self)
+        self.search_window.usage_changed.connect(self.statusBar().showMessage)
+        self.search_page_loaded.connect(self.on_search_page_loaded)
+        self.artist_tracks_loaded.connect(self.show_artist_tracks)
+        self.api_executor = ThreadPoolExecutor(max_workers=2)
+        self.search_query = None
+        self.search_ids = set()
+        self.current_stream_url = None
+        self.current_track = None
+        self.current_bitrate = None
+        self.current_stream_size = None
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1)
+        self.prefetch_future = None
+        self.seek_scheduler = SeekScheduler(parent=self)
+        self.seek_scheduler.seek_requested.connect(self.set_position)
+        self.seek_scheduler.prefetch_requested.connect(self.prefetch_around)
+        self.buffer_target = self.playback_profile.startup_buffer
+        self.holding_for_buffer = False
+        self.artist_username = ""
+        self.selected_genre = ""
+        self.page = 1
         self.current_track_index = 0
 
         self.timer = QTimer(self)
@@ -154,6 +318,12 @@ class HearThisPlayer(QMainWindow):
         self.load_more_button.clicked.connect(self.load_more_tracks)
         self.load_more_button.setVisible(False)
 
+        self.mix_order_combo = QComboBox(self)
+        self.mix_order_combo.addItems(list(SORT_KEYS))
+        self.mix_button = QPushButton("Mix Genres", self)
+        self.mix_button.clicked.connect(self.load_genre_mix)
+        self.mix_loader = None
+
         self.prev_page_button = QPushButton("<", self)
         self.prev_page_button.clicked.connect(self.load_prev_page)
 
@@ -167,6 +337,7 @@ class HearThisPlayer(QMainWindow):
         search_layout.addWidget(self.search_input)
         search_layout.addWidget(self.search_button)
         search_layout.addWidget(self.search_on_button)
+        search_layout.addWidget(self.search_catalog_button)
 
         load_buttons_layout = QHBoxLayout()
         load_buttons_layout.addWidget(self.load_artist_tracks_button)
@@ -179,6 +350,8 @@ class HearThisPlayer(QMainWindow):
         genre_layout.addWidget(self.prev_page_button)
         genre_layout.addWidget(self.next_page_button)
         genre_layout.addWidget(self.load_more_button)
+        genre_layout.addWidget(self.mix_order_combo)
+        genre_layout.addWidget(self.mix_button)
 
         info_layout = QVBoxLayout()
         info_layout.addWidget(self.artist_info_label)
@@ -199,17 +372,46 @@ class HearThisPlayer(QMainWindow):
         self.tracks_per_page = 20
         self.current_page = 1
 
-        self.load_genres()
+        self.genres = []
+        self.resume_position = 0
+        self.resume_track = None
+        self.session_executor = ThreadPoolExecutor(max_workers=1)
+        self.session_signature = None
+        self.genres_refreshed.connect(self.apply_genres)
+        snapshot = load_session(SESSION_PATH)
+        if snapshot and snapshot[0].get("genres"):
+            # Start from the saved category list; refresh it in the background.
+            self.apply_genres(snapshot[0]["genres"], snapshot[0].get("selected_genre"))
+            self.api_executor.submit(self.fetch_genres)
+        else:
+            self.load_genres()
+        if snapshot:
+            self.restore_session(*snapshot)
+        self.session_timer = QTimer(self)
+        self.session_timer.timeout.connect(self.save_session_async)
+        self.session_timer.start(60 * 1000)
+
+        # Fill the genre cache while nobody is using the player (see cache_warmer.py for the overnight CLI).
+        self.idle_warm_seconds = 300
+        self.last_activity = time.monotonic()
+        self.cache_warmer = None
+        self.cache_warmed_at = None
+        self.idle_timer = QTimer(self)
+        self.idle_timer.timeout.connect(self.warm_cache_when_idle)
+        self.idle_timer.start(60 * 1000)
 
     def create_media_controls(self):
         self.time_label = QLabel("00:00 / 00:00")
-        self.position_slider = QSlider(Qt.Horizontal)
+        self.buffer_label = QLabel("")
+        self.position_slider = WaveformSlider(Qt.Horizontal)
         self.position_slider.setRange(0, 0)
-        self.position_slider.sliderMoved.connect(self.set_position)
+        self.position_slider.sliderMoved.connect(self.seek_scheduler.request)
+        self.position_slider.sliderReleased.connect(self.seek_scheduler.flush)
 
         media_controls_layout = QHBoxLayout()
         media_controls_layout.addWidget(self.time_label)
         media_controls_layout.addWidget(self.position_slider)
+        media_controls_layout.addWidget(self.buffer_label)
 
         self.main_layout.addLayout(media_controls_layout)
 
@@ -241,6 +443,21 @@ class HearThisPlayer(QMainWindow):
         self.mute_action.triggered.connect(self.toggle_mute)
         self.toolbar.addAction(self.mute_action)
 
+        self.toolbar.addSeparator()
+
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems(list(PROFILES))
+        self.profile_combo.currentTextChanged.connect(self.set_playback_profile)
+        self.toolbar.addWidget(self.profile_combo)
+
+        self.memory_spin = QSpinBox()
+        self.memory_spin.setRange(4, 1024)
+        self.memory_spin.setValue(32)
+        self.memory_spin.setSuffix(" MB")
+        self.memory_spin.setToolTip("Memory ceiling for browsed pages")
+        self.memory_spin.valueChanged.connect(self.set_memory_ceiling)
+        self.toolbar.addWidget(self.memory_spin)
+
     def create_load_button(self, text, track_type):
         button = QPushButton(text, self)
         button.clicked.connect(lambda: self.load_artist_tracks(track_type=track_type, page=1, count=20))
@@ -263,41 +480,57 @@ class HearThisPlayer(QMainWindow):
     def search_on_hearthis(self):
         search_query = self.search_input.text().strip()
         if search_query:
-            search_url = f"https://api-v2.hearthis.at/search"
-            params = {
-                "t": search_query,
-                "page": 1,
-                "count": 5,
-            }
-
-            try:
-                response = requests.get(search_url, params=params)
-                response.raise_for_status()
-                search_results = response.json()
-
-                tracks = []
-                for track in search_results:
-                    title = track["title"]
-                    uri = track["uri"]
-                    stream_url = track["stream_url"]
-                    duration = track["duration"]
-
-                    track_data = {
-                        "title": title,
-                        "uri": uri,
-                        "stream_url": stream_url,
-                        "duration": duration,
-                    }
-
-                    tracks.append(track_data)
-
-                self.update_playlist(tracks)
+            self.last_activity = time.monotonic()
+            self.load_more_button.setVisible(False)
+            self.search_query = search_query
+            self.search_ids = set()
+            self.search_window.start(f"search:{search_query}", self.request_search_page)
+
+    def request_search_page(self, page):
+        query = self.search_query
+        future = self.search_pager.get(query, page)
+        # Runs on the worker thread, or right away if the page was cached; the signal hands it to the GUI thread.
+        future.add_done_callback(lambda f: self.search_page_loaded.emit(query, page, f))
+
+    def on_search_page_loaded(self, query, page, future):
+        if query != self.search_query:
+            return
+        try:
+            results = future.result()
+        except requests.RequestException as e:
+            print(f"Error performing search on hearthis.at: {e}")
+            self.search_window.page_failed(page)
+            return
 
-            except requests.RequestException as e:
-                print(f"Error performing search on hearthis.at: {e}")
+        tracks = []
+        for track in results:
+            if track.get("id") in self.search_ids or not track.get("stream_url"):
+                continue
+            self.search_ids.add(track.get("id"))
+            tracks.append(track)
+        self.catalog.ingest(tracks)
+        exhausted = len(results) < self.search_pager.page_size
+        if not exhausted:
+            self.search_pager.prefetch(query, page + 1)
+        self.search_window.page_loaded(page, tracks, last=exhausted)
+        self.page_label.setText(f"Search '{query}': {len(self.search_ids)} results"
+                                f"{'' if exhausted else ', scroll for more'}")
+
+    def end_search(self):
+        self.search_query = None
+        self.search_window.stop()
+
+    def search_catalog(self):
+        # Offline search over every track seen so far, e.g. "dub artist:mtmn genre:techno dur:30-90"
+        query = parse_query(self.search_input.text().strip())
+        if query:
+            results = self.catalog.search(**query)
+            self.update_playlist(results, ingest=False)
+            self.page_label.setText(f"Catalog: {len(results)} matches")
+            self.load_more_button.setVisible(False)
 
     def load_artist_info(self):
-        artist_api_url = f"https://api-v2.hearthis.at/{self.artist_username}/"
+        artist_api_url = f"{API_BASE}/{self.artist_username}/"
         try:
             response = requests.get(artist_api_url)
             response.raise_for_status()
@@ -315,44 +548,42 @@ class HearThisPlayer(QMainWindow):
         if not self.artist_username:
             print("Please select an artist.")
             return
+        self.api_executor.submit(self.fetch_artist_tracks, self.artist_username, track_type, page, count)
 
-        artist_api_url = f"https://api-v2.hearthis.at/{self.artist_username}/"
-        tracks_api_url = f"{artist_api_url}?type={track_type}&page={page}&count={count}"
+    def fetch_artist_tracks(self, artist_username, track_type, page, count):
+        # Runs on api_executor; download, decoding and projection stay off the GUI thread.
+        artist_api_url = f"{API_BASE}/{artist_username}/"
 
         try:
-            response_artist = requests.get(artist_api_url)
-            response_artist.raise_for_status()
-            artist_info = response_artist.json()
+            # Both go through the shared cache, so the other players see these pages as well.
+            artist_info = get_json(artist_api_url, cache_ttl=API_CACHE_TTL)
             self.update_artist_info_signal.emit(artist_info)
 
-            response_tracks = requests.get(tracks_api_url)
-            response_tracks.raise_for_status()
-            artist_tracks = response_tracks.json()
+            params = {"type": track_type, "page": page, "count": count}
+            artist_tracks = project_tracks(get_json(artist_api_url, params, cache_ttl=API_CACHE_TTL))
+            self.artist_tracks_loaded.emit(track_type, artist_tracks)
 
-            self.playlist.clear()
-            self.selected_tracks.clear()
-            self.local_playlist.clear()
-            self.selected_playlist.clear()
-            self.current_track_index = 0
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error loading artist {track_type}: {e}")
 
-            for track in artist_tracks:
-                title = track["title"]
-                track_data = {
-                    "id": track["id"],
-                    "uri": track["uri"],
-                    "stream_url": track["stream_url"],
-                    "duration": track["duration"],
-                }
+    def show_artist_tracks(self, track_type, artist_tracks):
+        self.catalog.ingest(artist_tracks)
 
-                item = QListWidgetItem(title)
-                item.setData(Qt.UserRole, track_data)
-                self.local_playlist.append((title, track_data))
-                self.playlist.addItem(item)
+        self.end_search()
+        self.playlist.clear()
+        self.selected_tracks.clear()
+        self.local_playlist.clear()
+        self.selected_playlist.clear()
+        self.current_track_index = 0
 
-            self.page_label.setText(f"Loaded artist {track_type} for {self.artist_username}")
+        for track in artist_tracks:
+            title = track["title"]
+            item = QListWidgetItem(title)
+            item.setData(Qt.UserRole, track)
+            self.local_playlist.append((title, track))
+            self.playlist.addItem(item)
 
-        except requests.RequestException as e:
-            print(f"Error loading artist {track_type}: {e}")
+        self.page_label.setText(f"Loaded artist {track_type} for {self.artist_username}")
 
     def update_genres(self, genres):
         print("Updated genres:", genres)
@@ -381,6 +612,31 @@ class HearThisPlayer(QMainWindow):
             self.loader.error_occurred.connect(self.handle_loading_error)
             self.loader.start()
 
+    def load_genre_mix(self):
+        genres = self.genre_selector.checked_genres()
+        if not genres:
+            print("Please check at least one genre to mix.")
+            return
+        if self.mix_loader and self.mix_loader.isRunning():
+            self.mix_loader.requestInterruption()
+            self.mix_loader.wait()
+
+        self.end_search()
+        self.playlist.clear()
+        self.local_playlist.clear()
+        self.load_more_button.setVisible(False)
+        self.page_label.setText(f"Mixing {', '.join(genres)}...")
+        self.show_loading_indicator()
+        self.mix_loader = GenreMixLoader(genres, self.mix_order_combo.currentText(), self.tracks_per_page)
+        self.mix_loader.rows_loaded.connect(self.append_to_playlist)
+        self.mix_loader.mix_finished.connect(self.genre_mix_loaded)
+        self.mix_loader.start()
+
+    def genre_mix_loaded(self, merged, duplicates):
+        self.hide_loading_indicator()
+        self.page_label.setText(f"Mixed {merged} tracks from {len(self.mix_loader.mix.genres)} genres "
+                                f"({duplicates} duplicates removed)")
+
     def load_more_tracks(self):
         self.current_page += 1
         self.load_page()
@@ -395,29 +651,159 @@ class HearThisPlayer(QMainWindow):
         self.load_page()
 
     def load_genres(self):
-        hearthis_api_url = "https://api-v2.hearthis.at/categories/"
+        hearthis_api_url = f"{API_BASE}/categories/"
         try:
             response = requests.get(hearthis_api_url)
             response.raise_for_status()
             genres_data = response.json()
             genres = [genre["id"] for genre in genres_data]
             self.genre_selector.set_genres(genres)
+            self.genres = genres
             self.update_genres_signal.emit(genres)
         except requests.RequestException as e:
             print(f"Error loading genres: {e}")
 
+    def fetch_genres(self):
+        try:
+            response = requests.get(f"{API_BASE}/categories/", timeout=20)
+            response.raise_for_status()
+            self.genres_refreshed.emit([genre["id"] for genre in response.json()])
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error loading genres: {e}")
+
+    def apply_genres(self, genres, select=None):
+        # Without blocking signals, filling the combo would load the first genre over the restored playlist.
+        if genres == self.genres:
+            return
+        select = select or self.genre_selector.genre_combo.currentText()
+        checked = set(self.genre_selector.checked_genres())
+        self.genre_selector.genre_combo.blockSignals(True)
+        self.genre_selector.set_genres(genres)
+        self.genre_selector.genre_combo.setCurrentText(select)
+        self.genre_selector.genre_combo.blockSignals(False)
+        for row in range(self.genre_selector.mix_list.count()):
+            item = self.genre_selector.mix_list.item(row)
+            if item.text() in checked:
+                item.setCheckState(Qt.Checked)
+        self.genres = genres
+
+    def session_state(self):
+        in_selected = self.tab_widget.currentIndex() == 1
+        widget = self.selected_tracks if in_selected else self.playlist
+        return {
+            "genres": self.genres,
+            "selected_genre": self.selected_genre,
+            "current_page": self.current_page,
+            "artist_username": self.artist_username,
+            "search_text": self.search_input.text(),
+            "page_label": self.page_label.text(),
+            "current_list": "selected" if in_selected else "playlist",
+            "current_row": widget.currentRow(),
+            "position": self.player.position() if self.current_track else self.resume_position,
+            "volume": self.volume_slider.value(),
+            "profile": self.playback_profile.name,
+            "memory_mb": self.memory_spin.value(),
+        }
+
+    def save_session_async(self, wait=False):
+        state = self.session_state()
+        lists = {
+            "playlist": [track for _, track in self.local_playlist],
+            "selected": [track for _, track in self.selected_playlist],
+        }
+        signature = (len(lists["playlist"]), len(lists["selected"]),
+                     id(lists["playlist"][-1]) if lists["playlist"] else None,
+                     id(lists["selected"][-1]) if lists["selected"] else None,
+                     json.dumps(state, sort_keys=True))
+        if signature == self.session_signature:
+            return
+        self.session_signature = signature
+        # Encoding a large session takes a moment; the lists are copied here and written on the worker.
+        future = self.session_executor.submit(save_session, SESSION_PATH, state, lists)
+        if wait:
+            try:
+                future.result()
+            except OSError as e:
+                print(f"Error saving session: {e}")
+
+    def restore_session(self, state, lists):
+        self.selected_genre = state.get("selected_genre") or ""
+        self.current_page = state.get("current_page") or 1
+        self.artist_username = state.get("artist_username") or ""
+        self.search_input.setText(state.get("search_text") or "")
+        self.volume_slider.setValue(state.get("volume", 100))
+        if state.get("profile") in PROFILES:
+            self.profile_combo.setCurrentText(state["profile"])
+        self.memory_spin.setValue(state.get("memory_mb", 32))
+
+        for widget, store, name in ((self.playlist, self.local_playlist, "playlist"),
+                                    (self.selected_tracks, self.selected_playlist, "selected")):
+            widget.setUpdatesEnabled(False)
+            for track in lists.get(name, []):
+                title = track.get("title")
+                if title is None:
+                    continue
+                item = QListWidgetItem(title)
+                item.setData(Qt.UserRole, track)
+                store.append((title, track))
+                widget.addItem(item)
+            widget.setUpdatesEnabled(True)
+
+        # Select the last track without starting it; Play picks it up and seeks to the saved offset.
+        in_selected = state.get("current_list") == "selected"
+        widget = self.selected_tracks if in_selected else self.playlist
+        self.tab_widget.setCurrentIndex(1 if in_selected else 0)
+        row = state.get("current_row", -1)
+        if 0 <= row < widget.count():
+            widget.blockSignals(True)
+            widget.setCurrentRow(row)
+            widget.blockSignals(False)
+            self.resume_track = widget.currentItem().data(Qt.UserRole)
+            self.resume_position = state.get("position") or 0
+        self.page_label.setText(state.get("page_label") or f"Restored {len(self.local_playlist)} tracks")
+
+    def is_idle(self):
+        return time.monotonic() - self.last_activity >= self.idle_warm_seconds
+
+    def warm_cache_when_idle(self):
+        if not self.genres or not self.is_idle():
+            return
+        if self.cache_warmer and self.cache_warmer.isRunning():
+            return
+        if self.cache_warmed_at and time.monotonic() - self.cache_warmed_at < 3600:
+            return
+        warmer = CacheWarmer(self.genre_cache, pages=3, count=self.tracks_per_page, rate=1.0, parallel=2)
+        self.cache_warmer = CacheWarmerThread(warmer, self.genres, self.is_idle)
+        self.cache_warmer.warm_finished.connect(self.cache_warm_finished)
+        self.cache_warmer.start()
+
+    def cache_warm_finished(self, stats):
+        if self.is_idle():
+            self.cache_warmed_at = time.monotonic()
+        print(f"Genre cache warmed: {stats['fetched']} pages fetched, {stats['fresh']} fresh, {stats['failed']} failed")
+
     def load_pages(self):
         executor = ThreadPoolExecutor(max_workers=5)
         executor.map(self.load_page, range(1, 36))
 
-    def update_playlist(self, tracks):
+    def update_playlist(self, tracks, ingest=True):
+        self.end_search()
         self.playlist.clear()
         self.local_playlist.clear()
 
+        if not self.append_to_playlist(tracks, ingest):
+            return
+
+        self.page_label.setText(f"Loaded page {self.current_page} for {self.selected_genre}")
+        self.load_more_button.setVisible(True)
+
+    def append_to_playlist(self, tracks, ingest=True):
         if not isinstance(tracks, list):
             print(f"Error: Expected a list of tracks, but got {type(tracks)}")
             print(f"Tracks data: {tracks}")
-            return
+            return False
+        if ingest:
+            self.catalog.ingest(tracks)
 
         for track in tracks:
             if not isinstance(track, dict):
@@ -435,9 +821,7 @@ class HearThisPlayer(QMainWindow):
             item.setData(Qt.UserRole, track)
             self.local_playlist.append((title, track))
             self.playlist.addItem(item)
-
-        self.page_label.setText(f"Loaded page {self.current_page} for {self.selected_genre}")
-        self.load_more_button.setVisible(True)
+        return True
 
     def update_playlist_and_cache(self, tracks):
         self.update_playlist(tracks)
@@ -447,31 +831,54 @@ class HearThisPlayer(QMainWindow):
     def play_track(self, item):
         if not item:
             return
+        self.last_activity = time.monotonic()
 
         if self.player.state() == QMediaPlayer.PlayingState:
             self.player.stop()
 
+        if self.stalls.count:
+            print(f"Previous track {self.stalls.summary()}")
+
         track = item.data(Qt.UserRole)
-        media_content = QMediaContent(QUrl(track["stream_url"]))
+        if track != self.resume_track:
+            self.resume_position = 0
+        self.resume_track = None
+        stream_url = media_url(self.playback_profile.select_stream_url(track))
+        self.qos.start_track(track, stream_url, self.stalls)
+        self.stalls.reset()
+        self.current_track = track
+        self.current_stream_url = stream_url
+        self.current_bitrate = None
+        self.current_stream_size = None
+        self.hold_for_buffer(self.playback_profile.adapt(self.throughput.bytes_per_second, None))
+
+        media_content = QMediaContent(QUrl(stream_url))
         self.player.setMedia(media_content)
         self.player.play()
+        self.probe_executor.submit(self.run_probe, stream_url, self.playback_profile.probe_bytes)
+        self.load_waveform(track)
 
-        duration = int(track["duration"]) // 1000
-        self.current_track_duration = QTime().fromMSecsSinceStartOfDay(duration * 1000)
-        self.position_slider.setRange(0, duration * 1000)
+        duration = track_duration_ms(track)
+        self.current_track_duration = QTime().fromMSecsSinceStartOfDay(duration)
+        self.position_slider.setRange(0, duration)
         self.timer.start(1000)
 
         self.play_pause_action.setIcon(QIcon.fromTheme("media-playback-pause"))
 
     def toggle_play(self):
         if self.player.state() == QMediaPlayer.PlayingState:
+            self.holding_for_buffer = False
             self.player.pause()
             self.play_pause_action.setIcon(QIcon.fromTheme("media-playback-start"))
+        elif self.current_track is None:
+            widget = self.selected_tracks if self.tab_widget.currentIndex() == 1 else self.playlist
+            self.play_track(widget.currentItem())
         else:
             self.player.play()
             self.play_pause_action.setIcon(QIcon.fromTheme("media-playback-pause"))
 
     def stop_play(self):
+        self.holding_for_buffer = False
         self.player.stop()
         self.play_pause_action.setIcon(QIcon.fromTheme("media-playback-start"))
         self.time_label.setText("00:00 / 00:00")
@@ -492,9 +899,115 @@ class HearThisPlayer(QMainWindow):
             self.player.setMuted(False)
             self.mute_action.setIcon(QIcon.fromTheme("audio-volume-high"))
 
+    def set_playback_profile(self, name):
+        self.playback_profile = PROFILES[name]
+        self.buffer_target = self.playback_profile.adapt(self.throughput.bytes_per_second, self.current_bitrate)
+
+    def set_memory_ceiling(self, megabytes):
+        self.search_window.set_max_bytes(megabytes * 1024 * 1024)
+
+    def hold_for_buffer(self, target):
+        self.buffer_target = target
+        self.holding_for_buffer = True
+
+    def run_probe(self, stream_url, probe_bytes):
+        try:
+            received, elapsed, total_size = probe_stream(stream_url, probe_bytes)
+        except requests.RequestException as e:
+            print(f"Error probing stream: {e}")
+            return
+        self.qos.add_bytes(stream_url, received)
+        self.probe_finished.emit(stream_url, received, elapsed, total_size)
+
+    def on_probe_finished(self, stream_url, received, elapsed, total_size):
+        self.throughput.add_sample(received, elapsed)
+        if stream_url != self.current_stream_url:
+            return
+
+        self.current_stream_size = total_size
+        self.qos.set_stream_size(stream_url, total_size)
+        duration = self.player.duration() or track_duration_ms(self.current_track)
+        if total_size and duration > 0:
+            self.current_bitrate = total_size / (duration / 1000)
+
+        if self.holding_for_buffer:
+            self.buffer_target = self.playback_profile.adapt(self.throughput.bytes_per_second, self.current_bitrate)
+        self.update_buffer_label(self.player.bufferStatus())
+
+    def load_waveform(self, track):
+        self.position_slider.set_waveform(None)
+        track_id = str(track.get("id") or "")
+        if not track_id:
+            return
+
+        samples = self.waveform_cache.get(track_id)
+        if samples is not None:
+            self.position_slider.set_waveform(samples)
+        elif track.get("waveform_data"):
+            self.probe_executor.submit(self.run_waveform_fetch, track_id, track["waveform_data"])
+
+    def run_waveform_fetch(self, track_id, waveform_url):
+        try:
+            samples = fetch_waveform(waveform_url)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error loading waveform: {e}")
+            return
+        self.waveform_cache.set(track_id, samples)
+        self.waveform_loaded.emit(track_id, samples)
+
+    def on_waveform_loaded(self, track_id, samples):
+        if self.current_track and str(self.current_track.get("id") or "") == track_id:
+            self.position_slider.set_waveform(samples)
+
+    def on_buffer_status(self, percent):
+        if self.holding_for_buffer:
+            if percent >= self.buffer_target:
+                self.holding_for_buffer = False
+                self.stalls.end()
+                self.player.play()
+            elif self.player.state() == QMediaPlayer.PlayingState:
+                self.player.pause()
+        self.update_buffer_label(percent)
+
+    def on_media_status(self, status):
+        if status == QMediaPlayer.StalledMedia:
+            self.stalls.start()
+            self.hold_for_buffer(max(self.playback_profile.rebuffer_buffer, self.buffer_target))
+        elif status == QMediaPlayer.BufferedMedia:
+            self.stalls.end()
+            self.qos.mark_buffered()
+            if self.resume_position:
+                self.player.setPosition(self.resume_position)
+                self.resume_position = 0
+        self.update_buffer_label(self.player.bufferStatus())
+
+    def update_buffer_label(self, percent):
+        self.buffer_label.setText(f"Buffer {percent}% / {self.buffer_target}% · {self.stalls.summary()}")
+
     def set_position(self, position):
         self.player.setPosition(position)
 
+    def prefetch_around(self, position, window=256 * 1024):
+        duration = self.player.duration()
+        if not self.current_stream_size or duration <= 0:
+            return
+        if self.prefetch_future and not self.prefetch_future.done():
+            return
+
+        offset = int(self.current_stream_size * position / duration)
+        start = max(0, min(offset - window // 4, self.current_stream_size - window))
+        self.prefetch_future = self.prefetch_executor.submit(self.run_prefetch, self.current_stream_url, start, window)
+
+    def run_prefetch(self, stream_url, start, length):
+        try:
+            received = prefetch_range(stream_url, start, length)
+            self.qos.add_bytes(stream_url, received)
+        except requests.RequestException as e:
+            print(f"Error prefetching stream range: {e}")
+
+    def on_position_changed(self, position):
+        self.qos.mark_position(position, self.player.duration())
+
     def update_duration(self):
         duration = self.player.duration()
         position = self.player.position()
@@ -554,6 +1067,7 @@ class HearThisPlayer(QMainWindow):
             self.artist_info_label.append(f"<b>Description:</b><br>{description}")
 
     def show_loading_indicator(self):
+        self.last_activity = time.monotonic()
         self.loading_label = QLabel("Loading...", self)
         self.main_layout.addWidget(self.loading_label)
 
@@ -566,6 +1080,18 @@ class HearThisPlayer(QMainWindow):
         print(f"Error loading genre tracks: {error_message}")
         self.hide_loading_indicator()
 
+    def closeEvent(self, event):
+        self.save_session_async(wait=True)
+        self.session_executor.shutdown()
+        self.qos.finish(self.stalls)
+        self.catalog.close()
+        self.search_pager.shutdown()
+        self.api_executor.shutdown(wait=False, cancel_futures=True)
+        if self.cache_warmer and self.cache_warmer.isRunning():
+            self.cache_warmer.requestInterruption()
+            self.cache_warmer.wait(2000)
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     player = HearThisPlayer()
@@ -5,14 +5,17 @@ from PyQt5.QtCore import Qt, QUrl, pyqtSignal, QObject, QTime, QTimer
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QListWidget, QListWidgetItem, QLineEdit, QLabel, QPushButton,
-    QFileDialog, QSlider, QSizePolicy, QComboBox, QTextBrowser, QTabWidget
+    QFileDialog, QSlider, QSizePolicy, QComboBox, QTextBrowser, QTabWidget, QSpinBox
 )
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 from PyQt5.QtGui import QIcon, QPixmap, QTextDocument
+from page_window import WindowedList
+from hearthis_api import API_BASE, API_CACHE_TTL, get_json, media_url
 
 
 class Signal(QObject):
     update_playlist_signal = pyqtSignal(list)
+    page_loaded = pyqtSignal(int, object)
     update_genres_signal = pyqtSignal(list)
     update_artist_info_signal = pyqtSignal(dict)
 
@@ -95,6 +98,7 @@ class HearThisPlayer(QMainWindow):
 
         self.signal = Signal()
         self.signal.update_playlist_signal.connect(self.update_playlist)
+        self.signal.page_loaded.connect(self.on_page_loaded)
         self.signal.update_genres_signal.connect(self.update_genres)
         self.signal.update_artist_info_signal.connect(self.update_artist_info)
 
@@ -115,6 +119,17 @@ class HearThisPlayer(QMainWindow):
 
 
         self.page = 1
+        # Artist pages load as the list scrolls; only a few stay in memory, the rest spill to disk.
+        self.page_executor = ThreadPoolExecutor(max_workers=2)
+        self.page_window = WindowedList(self.playlist, self.local_playlist, parent=self)
+        self.page_window.usage_changed.connect(self.statusBar().showMessage)
+
+        self.memory_spin = QSpinBox(self)
+        self.memory_spin.setRange(4, 1024)
+        self.memory_spin.setValue(32)
+        self.memory_spin.setSuffix(" MB")
+        self.memory_spin.setToolTip("Memory ceiling for browsed pages")
+        self.memory_spin.valueChanged.connect(lambda mb: self.page_window.set_max_bytes(mb * 1024 * 1024))
 
         self.load_genre_button = QPushButton("Load Genre", self)
         self.load_genre_button.clicked.connect(self.load_genre_tracks)
@@ -156,6 +171,7 @@ class HearThisPlayer(QMainWindow):
 
         page_layout = QHBoxLayout()
         page_layout.addWidget(self.page_label)
+        page_layout.addWidget(self.memory_spin)
 
         duration_layout = QHBoxLayout()
         duration_layout.addWidget(self.duration_label)
@@ -190,7 +206,7 @@ class HearThisPlayer(QMainWindow):
     def search_on_hearthis(self):
         search_query = self.search_input.text().strip()
         if search_query:
-            search_url = f"https://api-v2.hearthis.at/search"
+            search_url = f"{API_BASE}/search"
             params = {
                 "t": search_query,
                 "page": 1,
@@ -198,9 +214,7 @@ class HearThisPlayer(QMainWindow):
             }
 
             try:
-                response = requests.get(search_url, params=params)
-                response.raise_for_status()
-                search_results = response.json()
+                search_results = get_json(search_url, params, cache_ttl=API_CACHE_TTL)
 
                 # Extract information and update the playlist
                 tracks = []
@@ -247,11 +261,9 @@ class HearThisPlayer(QMainWindow):
             self.load_pages()
 
     def load_artist_info(self):
-        artist_api_url = f"https://api-v2.hearthis.at/{self.artist_username}/"
+        artist_api_url = f"{API_BASE}/{self.artist_username}/"
         try:
-            response = requests.get(artist_api_url)
-            response.raise_for_status()
-            artist_info = response.json()
+            artist_info = get_json(artist_api_url, cache_ttl=API_CACHE_TTL)
 
             avatar_url = artist_info.get("avatar_url")
             description = artist_info.get("description")
@@ -266,21 +278,18 @@ class HearThisPlayer(QMainWindow):
             print("Please select an artist.")
             return
 
-        artist_api_url = f"https://api-v2.hearthis.at/{self.artist_username}/"
-        tracks_api_url = f"{artist_api_url}?type={track_type}&page={page}&count={count}"
+        artist_api_url = f"{API_BASE}/{self.artist_username}/"
 
         try:
             # Pobierz informacje o artyście
-            response_artist = requests.get(artist_api_url)
-            response_artist.raise_for_status()
-            artist_info = response_artist.json()
+            artist_info = get_json(artist_api_url, cache_ttl=API_CACHE_TTL)
             self.signal.update_artist_info_signal.emit(artist_info)
 
             # Pobierz utwory artysty
-            response_tracks = requests.get(tracks_api_url)
-            response_tracks.raise_for_status()
-            artist_tracks = response_tracks.json()
+            params = {"type": track_type, "page": page, "count": count}
+            artist_tracks = get_json(artist_api_url, params, cache_ttl=API_CACHE_TTL)
 
+            self.page_window.stop()
             self.playlist.clear()
             self.selected_tracks.clear()
             self.local_playlist.clear()
@@ -315,17 +324,16 @@ class HearThisPlayer(QMainWindow):
             print("Please select a genre.")
             return
 
-        genre_api_url = f"https://api-v2.hearthis.at/categories/{selected_genre}/"
+        genre_api_url = f"{API_BASE}/categories/{selected_genre}/"
         params = {
             "page": self.page,
             "count": 20,
         }
 
         try:
-            response = requests.get(genre_api_url, params=params)
-            response.raise_for_status()
-            genre_tracks = response.json()
+            genre_tracks = get_json(genre_api_url, params, cache_ttl=API_CACHE_TTL)
 
+            self.page_window.stop()
             self.playlist.clear()
             self.selected_tracks.clear()
             self.local_playlist.clear()
@@ -360,7 +368,7 @@ class HearThisPlayer(QMainWindow):
         self.load_genre_tracks()
 
     def load_genres(self):
-        hearthis_api_url = "https://api-v2.hearthis.at/categories/"
+        hearthis_api_url = f"{API_BASE}/categories/"
         response = requests.get(hearthis_api_url)
 
         if response.status_code == 200:
@@ -370,24 +378,37 @@ class HearThisPlayer(QMainWindow):
             self.signal.update_genres_signal.emit(genres)
 
     def load_pages(self):
-        executor = ThreadPoolExecutor(max_workers=5)
-        executor.map(self.load_page, range(1, 36))
+        # Used to fetch 35 pages up front and keep them all; now pages follow the scroll position.
+        self.page_window.start(f"artist:{self.artist_username}", self.request_page)
 
-    def load_page(self, page):
-        hearthis_api_url = f"https://api-v2.hearthis.at/{self.artist_username}/?page={page}&count=5"
-        response = requests.get(hearthis_api_url)
-
-        if response.status_code == 200:
-            data = response.json()
-            tracks = data["data"]
+    def request_page(self, page):
+        self.page_executor.submit(self.load_page, self.artist_username, page)
 
-            if not tracks:
-                print(f"No more tracks found for {self.artist_username} on page {page}.")
-                return
-
-            self.signal.update_playlist_signal.emit(tracks)
+    def load_page(self, artist_username, page):
+        hearthis_api_url = f"{API_BASE}/{artist_username}/"
+        try:
+            # Shared with the other players on this host: a page one of them fetched is not downloaded again.
+            data = get_json(hearthis_api_url, {"page": page, "count": 5}, cache_ttl=API_CACHE_TTL)
+            tracks = data["data"] if isinstance(data, dict) else data
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"Error loading page {page} for {artist_username}: {e}")
+            tracks = None
+
+        if tracks is not None and not tracks:
+            print(f"No more tracks found for {artist_username} on page {page}.")
+        self.signal.page_loaded.emit(page, tracks)
+
+    def on_page_loaded(self, page, tracks):
+        if tracks is None:
+            self.page_window.page_failed(page)
+            return
+        self.page_window.page_loaded(page, tracks, last=len(tracks) < 5)
+        self.page = page
+        self.page_label.setText(f"Loaded page {page} for {self.artist_username}")
 
     def update_playlist(self, tracks):
+        # Search results are added to whatever is listed, outside the paged artist view.
+        self.page_window.stop()
         for track in tracks:
             title = track["title"]
             item = QListWidgetItem(title)
@@ -406,7 +427,7 @@ class HearThisPlayer(QMainWindow):
             self.player.stop()
 
         track = item.data(Qt.UserRole)
-        media_content = QMediaContent(QUrl(track["stream_url"]))
+        media_content = QMediaContent(QUrl(media_url(track["stream_url"])))
         self.player.setMedia(media_content)
         self.player.play()
 
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from hearthis_api import FEED_TYPES, RateLimiter, artist_feed_page, track_to_entry
+from incremental_m3u import load_checkpoint, write_atomic
+from playlist_convert import WRITERS, detect_format, read_entries
+from playlist_dedup import Deduplicator
+
+APPENDABLE_FORMATS = ("txt", "m3u", "jsonl")
+
+
+class Feed:
+    def __init__(self, artist, track_type, next_page=1, done=False):
+        self.artist = artist
+        self.track_type = track_type
+        self.next_to_request = next_page
+        self.next_to_write = next_page
+        self.done = done
+        self.failed = False
+        self.in_flight = 0
+        self.last_page = None
+        self.ready = {}
+        self.exported = 0
+
+    @property
+    def key(self):
+        return f"{self.artist}/{self.track_type}"
+
+    def wants_more(self, lookahead):
+        if self.done or self.failed or self.in_flight >= lookahead:
+            return False
+        return self.last_page is None or self.next_to_request <= self.last_page
+
+
+def export_artists(artists, output, track_types=FEED_TYPES, fmt=None, parallel=8, lookahead=3,
+                   count=20, rate=10.0, checkpoint_path=None, dedupe=False):
+    fmt = fmt or detect_format(output)
+    if fmt not in APPENDABLE_FORMATS:
+        raise ValueError(f"Resumable export needs one of {', '.join(APPENDABLE_FORMATS)}, not {fmt}")
+    checkpoint_path = checkpoint_path or f"{output}.checkpoint"
+    checkpoint = load_checkpoint(checkpoint_path) or {}
+    if checkpoint and not os.path.exists(output):
+        # The pages recorded there are gone with the output; start over instead of skipping them.
+        print(f"{output} is missing, ignoring checkpoint {checkpoint_path}", file=sys.stderr)
+        checkpoint = {}
+
+    feeds = []
+    for artist in artists:
+        for track_type in track_types:
+            state = checkpoint.get(f"{artist}/{track_type}", {})
+            feeds.append(Feed(artist, track_type, state.get("next_page", 1), state.get("done", False)))
+
+    resuming = bool(checkpoint)
+    dedup = Deduplicator() if dedupe else None
+    if dedup and resuming:
+        for _ in dedup.filter(read_entries(output, fmt)):
+            pass
+
+    limiter = RateLimiter(rate)
+    pending = {}
+    with open(output, "a" if resuming else "w", encoding="utf-8") as f, \
+            ThreadPoolExecutor(max_workers=parallel) as executor:
+        writer = WRITERS[fmt](f, header=not resuming)
+
+        def schedule(feed):
+            # Keep a few pages of every feed in flight, since the page count is unknown up front.
+            while feed.wants_more(lookahead):
+                future = executor.submit(artist_feed_page, feed.artist, feed.track_type,
+                                         feed.next_to_request, count, limiter)
+                pending[future] = (feed, feed.next_to_request)
+                feed.next_to_request += 1
+                feed.in_flight += 1
+
+        def save_checkpoint():
+            f.flush()
+            os.fsync(f.fileno())
+            state = {feed.key: {"next_page": feed.next_to_write, "done": feed.done} for feed in feeds}
+            write_atomic(checkpoint_path, lambda cf: json.dump(state, cf, indent=1))
+
+        for feed in feeds:
+            schedule(feed)
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                feed, page = pending.pop(future)
+                feed.in_flight -= 1
+                try:
+                    tracks = future.result()
+                except requests.RequestException as e:
+                    print(f"Error loading {feed.key} page {page}: {e}", file=sys.stderr)
+                    feed.failed = True
+                    continue
+
+                if len(tracks) < count and (feed.last_page is None or page < feed.last_page):
+                    feed.last_page = page
+                feed.ready[page] = tracks
+
+                # Pages can finish out of order; write them in order so the checkpoint stays exact.
+                while not feed.done and feed.next_to_write in feed.ready:
+                    for track in feed.ready.pop(feed.next_to_write):
+                        if not isinstance(track, dict) or not track.get("stream_url"):
+                            continue
+                        entry = track_to_entry(track)
+                        if dedup and not dedup.is_new(entry["url"]):
+                            continue
+                        entry.setdefault("artist", feed.artist)
+                        writer.write(entry)
+                        feed.exported += 1
+                    if feed.last_page is not None and feed.next_to_write >= feed.last_page:
+                        feed.done = True
+                    feed.next_to_write += 1
+                save_checkpoint()
+                schedule(feed)
+
+        writer.close()
+
+    if all(feed.done for feed in feeds):
+        # A finished export leaves nothing to resume; the next run starts a fresh file.
+        try:
+            os.remove(checkpoint_path)
+        except OSError:
+            pass
+    return feeds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every track, like and reshare of hearthis artists to a playlist.")
+    parser.add_argument("artists", nargs="*", help="artist usernames")
+    parser.add_argument("-o", "--output", required=True, help="output playlist (.txt, .m3u or .jsonl)")
+    parser.add_argument("--artists-file", help="file with one artist username per line")
+    parser.add_argument("--types", nargs="+", choices=FEED_TYPES, default=list(FEED_TYPES))
+    parser.add_argument("--format", choices=APPENDABLE_FORMATS, help="output format (default: by extension)")
+    parser.add_argument("--parallel", type=int, default=8, help="concurrent requests (default: 8)")
+    parser.add_argument("--lookahead", type=int, default=3, help="pages in flight per feed (default: 3)")
+    parser.add_argument("--count", type=int, default=20, help="tracks per page (default: 20)")
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second (default: 10)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--dedupe", action="store_true", help="skip tracks already exported under another feed")
+    args = parser.parse_args()
+
+    artists = list(args.artists)
+    if args.artists_file:
+        with open(args.artists_file) as f:
+            artists += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not artists:
+        parser.error("no artists given")
+
+    started = time.perf_counter()
+    try:
+        feeds = export_artists(artists, args.output, args.types, args.format, args.parallel, args.lookahead,
+                               args.count, args.rate, args.checkpoint, args.dedupe)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for feed in feeds:
+        status = "done" if feed.done else "failed, rerun to resume" if feed.failed else "partial"
+        print(f"{feed.key}: {feed.exported} tracks ({status})")
+    print(f"Exported in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import requests
+from genre_cache import GenreCache
+from shared_cache import CODECS
+from genre_mix import genre_page
+from hearthis_api import RateLimiter, get_json
+
+
+def category_list(limiter=None):
+    data = get_json("categories/", limiter=limiter)
+    return [genre["id"] for genre in data if isinstance(genre, dict) and genre.get("id")]
+
+
+def parse_window(text):
+    # "01:00-06:00" -> (start, end) as datetime.time; the window may wrap past midnight.
+    start, _, end = text.partition("-")
+    return (datetime.strptime(start.strip(), "%H:%M").time(), datetime.strptime(end.strip(), "%H:%M").time())
+
+
+def in_window(window, now=None):
+    if window is None:
+        return True
+    now = (now or datetime.now()).time()
+    start, end = window
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end
+
+
+def seconds_until(window, now=None):
+    now = now or datetime.now()
+    start = datetime.combine(now.date(), window[0])
+    if start <= now:
+        start += timedelta(days=1)
+    return (start - now).total_seconds()
+
+
+class CacheWarmer:
+    def __init__(self, cache, pages=3, count=20, rate=2.0, parallel=4, max_age=12 * 3600):
+        self.cache = cache
+        self.pages = pages
+        # Must match the player's tracks_per_page; cache files are keyed by genre and page only.
+        self.count = count
+        self.limiter = RateLimiter(rate)
+        self.parallel = parallel
+        self.max_age = max_age
+        self.stats = {"fetched": 0, "fresh": 0, "failed": 0}
+        self.stats_lock = threading.Lock()
+
+    def record(self, name):
+        # warm_page runs on the pool's threads.
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def warm_page(self, genre, page, should_continue):
+        age = self.cache.age(genre, page)
+        if age is not None and age < self.max_age:
+            self.record("fresh")
+            return True
+        if not should_continue():
+            return False
+        try:
+            tracks, _ = genre_page(genre, page, self.count, self.limiter)
+        except requests.RequestException as e:
+            print(f"Error warming {genre} page {page}: {e}", file=sys.stderr)
+            self.record("failed")
+            return False
+        self.cache.set(genre, page, tracks)
+        self.record("fetched")
+        # A short page is the genre's last one.
+        return len(tracks) >= self.count
+
+    def warm(self, genres, should_continue=lambda: True):
+        # Page 1 of every genre first, then page 2, ... so a cut-off run still covers every first click.
+        remaining = list(genres)
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            for page in range(1, self.pages + 1):
+                if not remaining or not should_continue():
+                    break
+                more = executor.map(lambda genre: self.warm_page(genre, page, should_continue), remaining)
+                remaining = [genre for genre, has_more in zip(remaining, more) if has_more]
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the genre page cache ahead of time.")
+    parser.add_argument("genres", nargs="*", help="genres to warm (default: every category)")
+    parser.add_argument("--cache-dir", help="private cache directory (default: the shared cache)")
+    parser.add_argument("--compression", choices=CODECS, help="codec for newly written pages (default: zstd if installed, else zlib)")
+    parser.add_argument("--level", type=int, help="compression level (default: the codec's own)")
+    parser.add_argument("--pages", type=int, default=3, help="pages per genre (default: 3)")
+    parser.add_argument("--count", type=int, default=20, help="tracks per page, as used by the player (default: 20)")
+    parser.add_argument("--rate", type=float, default=2.0, help="requests per second (default: 2)")
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--max-age", type=float, default=12, help="hours before a cached page is refetched (default: 12)")
+    parser.add_argument("--window", help="only run between these times, e.g. 01:00-06:00")
+    parser.add_argument("--loop", action="store_true", help="keep running, once per window (or every --max-age hours)")
+    args = parser.parse_args()
+
+    try:
+        window = parse_window(args.window) if args.window else None
+    except ValueError:
+        parser.error("--window must look like 01:00-06:00")
+
+    cache = GenreCache(args.cache_dir, args.compression, args.level)
+    while True:
+        if not in_window(window):
+            delay = seconds_until(window)
+            print(f"Waiting {delay / 3600:.1f}h for the {args.window} window")
+            time.sleep(delay)
+
+        started = time.perf_counter()
+        warmer = CacheWarmer(cache, args.pages, args.count, args.rate, args.parallel, args.max_age * 3600)
+        try:
+            genres = args.genres or category_list(warmer.limiter)
+        except requests.RequestException as e:
+            print(f"Error loading genres: {e}", file=sys.stderr)
+            genres = []
+        stats = warmer.warm(genres, lambda: in_window(window))
+        print(f"{len(genres)} genres: {stats['fetched']} pages fetched, {stats['fresh']} already fresh, "
+              f"{stats['failed']} failed in {time.perf_counter() - started:.1f}s")
+
+        if not args.loop:
+            break
+        if window:
+            time.sleep(seconds_until(window))
+        else:
+            time.sleep(args.max_age * 3600)
+
+
+if __name__ == "__main__":
+    main()
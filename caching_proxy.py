@@ -0,0 +1,496 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, urlsplit
+import requests
+from hearthis_api import session
+from shared_cache import SharedCache
+
+UPSTREAM_API = "https://api-v2.hearthis.at"
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+HEADER = struct.Struct("<I")
+# Hop-by-hop and length headers are ours to set, never copied from upstream.
+SKIP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "content-encoding"}
+
+
+class SingleFlight:
+    # Identical requests arriving while one is already upstream wait for it instead of going out again.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fetch):
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+        if leader:
+            try:
+                future.set_result(fetch())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    del self.calls[key]
+        return future.result(), not leader
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.started = time.time()
+
+    def add(self, name, n=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def snapshot(self, media):
+        with self.lock:
+            counts = dict(self.counts)
+
+        def rate(hits, total):
+            return round(hits / total, 3) if total else None
+
+        api_total = sum(counts.get(f"api_{name}", 0) for name in ("hits", "revalidated", "misses", "coalesced", "stale"))
+        block_total = sum(counts.get(f"media_{name}", 0) for name in ("hits", "misses", "coalesced"))
+        return {
+            "uptime_seconds": round(time.time() - self.started),
+            "api": {
+                "requests": api_total,
+                "hits": counts.get("api_hits", 0),
+                "revalidated": counts.get("api_revalidated", 0),
+                "misses": counts.get("api_misses", 0),
+                "coalesced": counts.get("api_coalesced", 0),
+                "stale_served": counts.get("api_stale", 0),
+                "errors": counts.get("api_errors", 0),
+                # Revalidated entries still cost a round trip, but no body crosses the uplink.
+                "hit_rate": rate(api_total - counts.get("api_misses", 0), api_total),
+            },
+            "media": {
+                "requests": counts.get("media_requests", 0),
+                "blocks": block_total,
+                "block_hits": counts.get("media_hits", 0),
+                "block_misses": counts.get("media_misses", 0),
+                "coalesced": counts.get("media_coalesced", 0),
+                "errors": counts.get("media_errors", 0),
+                "hit_rate": rate(block_total - counts.get("media_misses", 0), block_total),
+                "bytes_served": counts.get("media_bytes_served", 0),
+                "stored_bytes": media.stored_bytes,
+                "max_bytes": media.max_bytes,
+                "stored_blocks": len(media.blocks),
+            },
+            "upstream_bytes": counts.get("upstream_bytes", 0),
+        }
+
+
+def pack_entry(meta, body):
+    header = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(len(header)) + header + body
+
+
+def unpack_entry(data):
+    (size,) = HEADER.unpack_from(data, 0)
+    return json.loads(data[HEADER.size:HEADER.size + size]), data[HEADER.size + size:]
+
+
+class ApiCache:
+    # API responses on disk (compressed by SharedCache) with a TTL; once stale they are
+    # revalidated with If-None-Match / If-Modified-Since when upstream gave a validator.
+    def __init__(self, directory, upstream, ttl, stats):
+        self.store = SharedCache("api", directory)
+        self.upstream = upstream.rstrip("/")
+        self.ttl = ttl
+        self.stats = stats
+        self.flights = SingleFlight()
+
+    def load(self, key):
+        data = self.store.get(key)
+        if data is None:
+            return None
+        try:
+            return unpack_entry(data)
+        except (struct.error, ValueError):
+            return None
+
+    def get(self, path_and_query):
+        entry = self.load(path_and_query)
+        if entry and time.time() - entry[0]["fetched"] < self.ttl:
+            self.stats.add("api_hits")
+            return entry
+        (entry, outcome), coalesced = self.flights.do(path_and_query, lambda: self.refresh(path_and_query, entry))
+        self.stats.add("api_coalesced" if coalesced else f"api_{outcome}")
+        return entry
+
+    def refresh(self, path_and_query, entry):
+        headers = {}
+        if entry:
+            if entry[0].get("etag"):
+                headers["If-None-Match"] = entry[0]["etag"]
+            if entry[0].get("last_modified"):
+                headers["If-Modified-Since"] = entry[0]["last_modified"]
+        try:
+            response = session().get(self.upstream + path_and_query, headers=headers, timeout=20)
+        except requests.RequestException as e:
+            if entry:
+                print(f"Serving stale {path_and_query}: {e}", file=sys.stderr)
+                return entry, "stale"
+            raise
+        if response.status_code == 304 and entry:
+            meta, body = entry
+            meta["fetched"] = time.time()
+            self.store.set(path_and_query, pack_entry(meta, body))
+            return (meta, body), "revalidated"
+        self.stats.add("upstream_bytes", len(response.content))
+        meta = {
+            "status": response.status_code,
+            "fetched": time.time(),
+            "content_type": response.headers.get("Content-Type", "application/json"),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        if response.status_code == 200:
+            self.store.set(path_and_query, pack_entry(meta, response.content))
+        elif entry and response.status_code >= 500:
+            return entry, "stale"
+        return (meta, response.content), "misses"
+
+
+class MediaStore:
+    # Audio kept as fixed-size blocks of the upstream file, so any byte range a player asks
+    # for is assembled from blocks already on disk plus the few that are missing. Blocks are
+    # evicted least recently used first once the store is over max_bytes.
+    def __init__(self, directory, max_bytes, block_size, stats):
+        self.store = SharedCache("media", directory, codec="none")
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.stats = stats
+        self.flights = SingleFlight()
+        self.lock = threading.Lock()
+        self.blocks = OrderedDict()
+        self.stored_bytes = 0
+        paths = [path for path in self.store.directory.glob("*.b*") if path.is_file()]
+        for path in sorted(paths, key=lambda path: path.stat().st_mtime):
+            self.blocks[path.name] = path.stat().st_size
+            self.stored_bytes += self.blocks[path.name]
+
+    def digest(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def info(self, url):
+        # Total size and content type, learned from the first block fetched for this URL.
+        data = self.store.get(f"{self.digest(url)}.meta")
+        return json.loads(data) if data else None
+
+    def block(self, url, index):
+        key = f"{self.digest(url)}.b{index}"
+        data = self.store.get(key)
+        if data is not None:
+            self.stats.add("media_hits")
+            self.touch(key)
+            return data
+        data, coalesced = self.flights.do(key, lambda: self.fetch_block(url, index, key))
+        self.stats.add("media_coalesced" if coalesced else "media_misses")
+        return data
+
+    def fetch_block(self, url, index, key):
+        start = index * self.block_size
+        headers = {"Range": f"bytes={start}-{start + self.block_size - 1}"}
+        with session().get(url, headers=headers, stream=True, timeout=30) as response:
+            if response.status_code == 416:
+                return b""
+            response.raise_for_status()
+            total = None
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code == 206 and "/" in content_range:
+                size = content_range.rsplit("/", 1)[1]
+                total = int(size) if size.isdigit() else None
+                skip = 0
+            else:
+                # Upstream ignored the range and sent the whole file; read up to our block.
+                length = response.headers.get("Content-Length", "")
+                total = int(length) if length.isdigit() else None
+                skip = start
+            if total is None:
+                raise requests.RequestException(f"{url} has no known size, cannot cache byte ranges")
+            data = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if skip:
+                    dropped = min(skip, len(chunk))
+                    chunk = chunk[dropped:]
+                    skip -= dropped
+                data += chunk
+                if len(data) >= self.block_size:
+                    break
+        data = bytes(data[:self.block_size])
+        self.stats.add("upstream_bytes", len(data))
+        self.store.set(f"{self.digest(url)}.meta", json.dumps(
+            {"url": url, "size": total, "content_type": response.headers.get("Content-Type", "audio/mpeg")}).encode())
+        self.store.set(key, data)
+        self.added(key, len(data))
+        return data
+
+    def touch(self, key):
+        with self.lock:
+            if key not in self.blocks:
+                return
+            self.blocks.move_to_end(key)
+        try:
+            # The mtime is the recency a restarted proxy rebuilds its LRU order from.
+            os.utime(self.store.path(key))
+        except OSError:
+            pass
+
+    def added(self, key, size):
+        evicted = []
+        with self.lock:
+            self.stored_bytes += size - self.blocks.pop(key, 0)
+            self.blocks[key] = size
+            while self.stored_bytes > self.max_bytes and len(self.blocks) > 1:
+                old_key, old_size = self.blocks.popitem(last=False)
+                self.stored_bytes -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            self.store.delete(old_key)
+
+
+class ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, api, media, stats):
+        super().__init__(address, ProxyHandler)
+        self.api = api
+        self.media = media
+        self.stats = stats
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.route(head=False)
+
+    def do_HEAD(self):
+        self.route(head=True)
+
+    def route(self, head):
+        parts = urlsplit(self.path)
+        try:
+            if parts.path == "/stats":
+                body = json.dumps(self.server.stats.snapshot(self.server.media), indent=1).encode()
+                self.reply(200, {"Content-Type": "application/json"}, body, head)
+            elif parts.path == "/api" or parts.path.startswith("/api/"):
+                self.serve_api(self.path[4:] or "/", head)
+            elif parts.path == "/media":
+                url = parse_qs(parts.query).get("url", [""])[0]
+                if not url.startswith(("http://", "https://")):
+                    self.reply(400, {}, b"missing ?url=", head)
+                else:
+                    self.serve_media(url, head)
+            else:
+                self.reply(404, {}, b"not found", head)
+        except (BrokenPipeError, ConnectionResetError):
+            # The player hung up (seek, skip); nothing left to answer.
+            pass
+
+    def serve_api(self, path_and_query, head):
+        try:
+            meta, body = self.server.api.get(path_and_query)
+        except requests.RequestException as e:
+            self.server.stats.add("api_errors")
+            self.reply(502, {}, str(e).encode(), head)
+            return
+        self.reply(meta["status"], {"Content-Type": meta["content_type"]}, body, head)
+
+    def serve_media(self, url, head):
+        media = self.server.media
+        self.server.stats.add("media_requests")
+        match = RANGE_RE.match(self.headers.get("Range", "").strip())
+        start = int(match.group(1)) if match and match.group(1) else 0
+        # bytes=-N: the last N bytes, which needs the size before the first block can be chosen.
+        suffix = int(match.group(2)) if match and not match.group(1) and match.group(2) else None
+        known = media.info(url)
+        if known and suffix is not None:
+            start = max(0, known["size"] - suffix)
+        if known and start >= known["size"]:
+            self.reply(416, {"Content-Range": f"bytes */{known['size']}"}, b"", head)
+            return
+        try:
+            first_index = start // media.block_size
+            first = media.block(url, first_index)
+            info = media.info(url)
+            total = info["size"]
+            if suffix is not None:
+                start = max(0, total - suffix)
+            end = int(match.group(2)) if match and match.group(1) and match.group(2) else total - 1
+            end = min(end, total - 1)
+        except (requests.RequestException, TypeError, KeyError) as e:
+            self.server.stats.add("media_errors")
+            self.reply(502, {}, str(e).encode(), head)
+            return
+        if start >= total:
+            self.reply(416, {"Content-Range": f"bytes */{total}"}, b"", head)
+            return
+
+        headers = {"Content-Type": info["content_type"], "Accept-Ranges": "bytes", "Content-Length": str(end - start + 1)}
+        if match:
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        self.send_response(206 if match else 200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if head:
+            return
+
+        index = start // media.block_size
+        position = start
+        while position <= end:
+            try:
+                data = first if index == first_index else media.block(url, index)
+            except requests.RequestException as e:
+                # Headers are out already; all we can do is cut the response short.
+                print(f"Error fetching {url} block {index}: {e}", file=sys.stderr)
+                self.server.stats.add("media_errors")
+                self.close_connection = True
+                return
+            if not data:
+                self.close_connection = True
+                return
+            offset = position - index * media.block_size
+            piece = data[offset:offset + end - position + 1]
+            self.wfile.write(piece)
+            self.server.stats.add("media_bytes_served", len(piece))
+            position += len(piece)
+            index += 1
+
+    def reply(self, status, headers, body, head):
+        self.send_response(status)
+        for name, value in headers.items():
+            if name.lower() not in SKIP_HEADERS:
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SampleUpstream(BaseHTTPRequestHandler):
+    # A ranged audio file for --self-test: 5000 bytes whose values give away their offset.
+    body = bytes(i * 7 % 251 for i in range(5000))
+
+    def do_GET(self):
+        match = RANGE_RE.match(self.headers.get("Range", ""))
+        start = int(match.group(1)) if match else 0
+        end = min(int(match.group(2)), len(self.body) - 1) if match else len(self.body) - 1
+        if start >= len(self.body):
+            self.send_response(416)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(206 if match else 200)
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(self.body)}")
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(self.body[start:end + 1])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_self_test():
+    body = SampleUpstream.body
+    size = len(body)
+    # (Range header, expected status, first and last byte); each range is asked cold and then from cache.
+    cases = [
+        (None, 200, 0, size - 1),
+        ("bytes=0-0", 206, 0, 0),
+        ("bytes=1500-2100", 206, 1500, 2100),
+        ("bytes=4000-", 206, 4000, size - 1),
+        ("bytes=1023-", 206, 1023, size - 1),
+        ("bytes=-100", 206, size - 100, size - 1),
+        ("bytes=-1500", 206, size - 1500, size - 1),
+        ("bytes=-9000", 206, 0, size - 1),
+        ("bytes=4990-9000", 206, 4990, size - 1),
+        ("bytes=5000-", 416, None, None),
+    ]
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), SampleUpstream)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = Stats()
+        media = MediaStore(Path(tmp) / "media", 2 ** 20, 1024, stats)
+        proxy = ProxyServer(("127.0.0.1", 0), ApiCache(Path(tmp) / "api", UPSTREAM_API, 60, stats), media, stats)
+        threading.Thread(target=proxy.serve_forever, daemon=True).start()
+        for n, (header, status, start, end) in enumerate(cases):
+            for attempt in ("cold", "cached"):
+                # A fresh URL per case, so "cold" really starts with an empty store.
+                url = quote(f"http://127.0.0.1:{upstream.server_port}/mix-{n}.mp3", safe="")
+                response = requests.get(f"http://127.0.0.1:{proxy.server_port}/media?url={url}",
+                                        headers={"Range": header} if header else {}, timeout=10)
+                ok = response.status_code == status
+                if ok and start is not None:
+                    ok = response.content == body[start:end + 1]
+                if ok and status == 206:
+                    ok = response.headers.get("Content-Range") == f"bytes {start}-{end}/{size}"
+                failures += not ok
+                print(f"{header or 'no range':>16} {attempt:>6}: {response.status_code} "
+                      f"{response.headers.get('Content-Range', '')} {'ok' if ok else 'FAILED'}")
+        proxy.shutdown()
+    upstream.shutdown()
+    print(f"{len(cases) * 2 - failures}/{len(cases) * 2} passed")
+    return failures == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caching HTTP proxy for the hearthis API and audio streams, "
+                                                 "shared by every player and restreamer on the network.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--cache-dir", default=os.path.join(os.path.expanduser("~/.cache"), "hearthis-proxy"))
+    parser.add_argument("--upstream", default=os.environ.get("HEARTHIS_UPSTREAM", UPSTREAM_API),
+                        help=f"API to proxy (default: {UPSTREAM_API})")
+    parser.add_argument("--api-ttl", type=float, default=600, help="seconds an API response is served without asking upstream (default: 600)")
+    parser.add_argument("--media-size", type=float, default=10, help="GiB of audio to keep (default: 10)")
+    parser.add_argument("--block-size", type=int, default=1024, help="KiB per cached audio block (default: 1024)")
+    parser.add_argument("--self-test", action="store_true", help="check byte-range handling against a local sample upstream")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(0 if run_self_test() else 1)
+
+    cache_dir = Path(args.cache_dir)
+    stats = Stats()
+    api = ApiCache(cache_dir / "api", args.upstream, args.api_ttl, stats)
+    media = MediaStore(cache_dir / "media", int(args.media_size * 2 ** 30), args.block_size * 1024, stats)
+    server = ProxyServer((args.host, args.port), api, media, stats)
+    print(f"Caching proxy on {args.host}:{args.port}, {media.stored_bytes / 2 ** 20:.0f} MiB of audio cached")
+    print(f"  clients: HEARTHIS_API_BASE=http://<this host>:{args.port}/api "
+          f"HEARTHIS_MEDIA_PROXY=http://<this host>:{args.port}; stats at GET /stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(stats.snapshot(media)))
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
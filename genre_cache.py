@@ -0,0 +1,72 @@
+import argparse
+import json
+import random
+import tempfile
+import time
+from hearthis_api import decode_tracks, loads, project_tracks, sample_page
+from shared_cache import CODECS, SharedCache
+
+
+class GenreCache:
+    # Backed by the shared cache (~/.cache/hearthis/genres), so every player on the host sees
+    # pages fetched by the others; pass cache_dir for a private directory.
+    def __init__(self, cache_dir=None, codec=None, level=None):
+        self.store = SharedCache("genres", cache_dir, codec, level)
+        self.cache_dir = self.store.directory
+
+    def key(self, genre, page):
+        return f"{genre}_page{page}.json"
+
+    def get(self, genre, page):
+        data = self.store.get(self.key(genre, page))
+        if data is None:
+            return None
+        # Pages cached before projection still hold whole API records; trim them on the way in.
+        return decode_tracks(data)
+
+    def set(self, genre, page, data):
+        self.store.set(self.key(genre, page), json.dumps(data).encode("utf-8"))
+
+    def age(self, genre, page):
+        return self.store.age(self.key(genre, page))
+
+
+def run_benchmark(pages, count):
+    rng = random.Random(1)
+    bodies = [project_tracks(loads(sample_page(count, rng))) for _ in range(pages)]
+    settings = [("none", 0), ("zlib", 1), ("zlib", 6), ("zlib", 9)]
+    if "zstd" in CODECS:
+        settings += [("zstd", 1), ("zstd", 3), ("zstd", 9), ("zstd", 19)]
+    print(f"{pages} pages of {count} tracks")
+    for codec, level in settings:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = GenreCache(tmp, codec, level)
+            started = time.perf_counter()
+            for page, tracks in enumerate(bodies, 1):
+                cache.set("Techno", page, tracks)
+            written = time.perf_counter() - started
+            started = time.perf_counter()
+            for page in range(1, pages + 1):
+                cache.get("Techno", page)
+            read = time.perf_counter() - started
+            stats = [path.stat() for path in cache.cache_dir.glob("*.json")]
+            size = sum(stat.st_size for stat in stats)
+            # What the entries really take on disk, rounded up to whole filesystem blocks.
+            allocated = sum(stat.st_blocks * 512 for stat in stats)
+            print(f"{codec:>4} {level:>2}: {size / pages / 1024:5.1f} KiB/page ({allocated / 2 ** 20:.1f} MiB allocated), "
+                  f"write {written / pages * 1000:.2f} ms/page, read+decode {read / pages * 1000:.3f} ms/page")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genre page cache tools.")
+    parser.add_argument("--benchmark", type=int, metavar="PAGES", help="compare cache codecs on generated genre pages")
+    parser.add_argument("--count", type=int, default=20, help="tracks per benchmark page (default: 20)")
+    args = parser.parse_args()
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.count)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import heapq
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from hearthis_api import RateLimiter, get_json, project_tracks, track_to_entry
+from playlist_convert import WRITERS, detect_format
+
+
+def play_count(track):
+    try:
+        return int(track.get("playback_count") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+SORT_KEYS = {
+    "date": lambda track: str(track.get("created_at") or ""),
+    "plays": play_count,
+}
+
+
+def genre_page(genre, page, count, limiter=None):
+    started = time.perf_counter()
+    tracks = project_tracks(get_json(f"categories/{genre}/", {"page": page, "count": count}, limiter=limiter))
+    return tracks, time.perf_counter() - started
+
+
+class GenreFeed:
+    # One genre's tracks in descending sort order; all of its pages are requested up front.
+    def __init__(self, executor, genre, order, pages, count, limiter=None):
+        self.genre = genre
+        self.order = order
+        self.count = count
+        self.futures = [executor.submit(genre_page, genre, page, count, limiter) for page in range(1, pages + 1)]
+        self.slowest = 0.0
+
+    def pages(self):
+        for future in self.futures:
+            try:
+                tracks, elapsed = future.result()
+            except requests.RequestException as e:
+                print(f"Error loading genre {self.genre}: {e}", file=sys.stderr)
+                return
+            self.slowest = max(self.slowest, elapsed)
+            yield tracks
+            if len(tracks) < self.count:
+                return
+
+    def __iter__(self):
+        key = SORT_KEYS[self.order]
+        if self.order == "date":
+            # Categories are served newest first, so each page can join the merge as soon as it arrives.
+            for tracks in self.pages():
+                yield from sorted(tracks, key=key, reverse=True)
+        else:
+            # Play counts are not the feed order; a genre is only ordered once all its pages are in.
+            tracks = [track for page in self.pages() for track in page]
+            yield from sorted(tracks, key=key, reverse=True)
+
+
+class GenreMix:
+    def __init__(self, genres, order="date", pages=1, count=20, limiter=None):
+        self.genres = list(dict.fromkeys(genres))
+        self.order = order
+        self.pages = pages
+        self.count = count
+        self.limiter = limiter
+        self.duplicates = 0
+        self.feeds = []
+
+    def __iter__(self):
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self.genres) * self.pages))
+        try:
+            self.feeds = [GenreFeed(executor, genre, self.order, self.pages, self.count, self.limiter)
+                          for genre in self.genres]
+            seen = set()
+            # heapq.merge only needs the head of every feed, so the first rows are ready once
+            # each genre's first page is in, while later pages are still downloading.
+            for track in heapq.merge(*self.feeds, key=SORT_KEYS[self.order], reverse=True):
+                track_id = track.get("id")
+                if track_id is not None:
+                    if track_id in seen:
+                        self.duplicates += 1
+                        continue
+                    seen.add(track_id)
+                yield track
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def slowest_page(self):
+        return max((feed.slowest for feed in self.feeds), default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load several genres at once and merge them into one chart.")
+    parser.add_argument("genres", nargs="+")
+    parser.add_argument("-o", "--output", help="playlist to write (.txt, .m3u, .xspf or .jsonl); default: print titles")
+    parser.add_argument("--order", choices=SORT_KEYS, default="date", help="newest first or most played first")
+    parser.add_argument("--pages", type=int, default=1, help="pages per genre (default: 1)")
+    parser.add_argument("--count", type=int, default=20, help="tracks per page (default: 20)")
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second (default: 10)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    mix = GenreMix(args.genres, args.order, args.pages, args.count, RateLimiter(args.rate))
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+    writer = WRITERS[detect_format(args.output)](out) if out else None
+    merged = 0
+    first = None
+    for track in mix:
+        if first is None:
+            first = time.perf_counter() - started
+        merged += 1
+        if writer:
+            if track.get("stream_url"):
+                writer.write(track_to_entry(track))
+        else:
+            print(f"{track.get('created_at', '')}  {play_count(track):>7}  {track.get('title')}")
+    if writer:
+        writer.close()
+        out.close()
+    print(f"Merged {merged} tracks from {len(mix.genres)} genres ({mix.duplicates} duplicates) in "
+          f"{time.perf_counter() - started:.2f}s; first row after {first or 0:.2f}s, "
+          f"slowest page {mix.slowest_page():.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
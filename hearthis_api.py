@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+from urllib.parse import quote, urlencode
+import requests
+from shared_cache import SharedCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PUBLIC_API_BASE = "https://api-v2.hearthis.at"
+API_BASE = os.environ.get("HEARTHIS_API_BASE", PUBLIC_API_BASE).rstrip("/")
+# e.g. http://proxyhost:8780 to fetch audio through caching_proxy.py
+MEDIA_PROXY = os.environ.get("HEARTHIS_MEDIA_PROXY", "").rstrip("/")
+FEED_TYPES = ("tracks", "likes", "reshares")
+
+# Everything the players, exporters and caches read from a track; the rest of the API response is dropped.
+TRACK_FIELDS = (
+    "id", "title", "uri", "permalink", "permalink_url", "stream_url", "low_stream_url", "stream_url_low",
+    "preview_stream_url", "duration", "genre", "created_at", "playback_count", "artwork_url",
+    "waveform_data", "artist",
+)
+USER_FIELDS = ("username", "permalink")
+# How long a page fetched by any player on this host is served to the others without asking the API.
+API_CACHE_TTL = 600
+
+_local = threading.local()
+_api_cache = None
+
+
+def api_cache():
+    # Opened on first use, so importing this module does not create the cache directory.
+    global _api_cache
+    if _api_cache is None:
+        _api_cache = SharedCache("api")
+    return _api_cache
+
+
+def session():
+    # requests sessions are not shared between threads; keep one per worker for keep-alive.
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+class RateLimiter:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+def loads(data):
+    # orjson when installed (several times faster on large pages), the standard library otherwise.
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def project_track(track):
+    slim = {field: track[field] for field in TRACK_FIELDS if track.get(field) is not None}
+    user = track.get("user")
+    if isinstance(user, dict):
+        slim["user"] = {field: user[field] for field in USER_FIELDS if user.get(field)}
+    return slim
+
+
+def project_tracks(data):
+    if isinstance(data, dict):
+        data = data.get("data") or []
+    return [project_track(track) for track in data if isinstance(track, dict)]
+
+
+def decode_tracks(content):
+    return project_tracks(loads(content))
+
+
+def api_url(path):
+    # Full URLs on the public API host follow HEARTHIS_API_BASE too, so a proxy sees every call.
+    if path.startswith(PUBLIC_API_BASE):
+        path = path[len(PUBLIC_API_BASE):]
+    return path if "://" in path else f"{API_BASE}/{path.lstrip('/')}"
+
+
+def media_url(url):
+    if MEDIA_PROXY and url and url.startswith(("http://", "https://")):
+        return f"{MEDIA_PROXY}/media?url={quote(url, safe='')}"
+    return url
+
+
+def get_json(path, params=None, timeout=20, retries=3, limiter=None, cache_ttl=None):
+    url = api_url(path)
+    key = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+
+    def fetch():
+        if limiter:
+            limiter.wait()
+        response = session().get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.content
+
+    for attempt in range(retries):
+        try:
+            # With cache_ttl, concurrent players asking for the same page make one request between them.
+            content = api_cache().get_or_fetch(key, fetch, cache_ttl) if cache_ttl else fetch()
+            try:
+                return loads(content)
+            except ValueError as e:
+                if cache_ttl:
+                    api_cache().delete(key)
+                raise requests.RequestException(f"invalid JSON from {url}: {e}")
+        except requests.RequestException as e:
+            status = e.response.status_code if e.response is not None else None
+            if attempt == retries - 1 or (status and 400 <= status < 500 and status != 429):
+                raise
+            print(f"Error fetching {url} (attempt {attempt + 1}): {e}. Retrying...")
+            time.sleep(attempt + 1)
+
+
+def artist_feed_page(artist, track_type="tracks", page=1, count=20, limiter=None):
+    return project_tracks(get_json(f"{artist}/", {"type": track_type, "page": page, "count": count}, limiter=limiter))
+
+
+def search_page(query, page=1, count=20, limiter=None, cache_ttl=API_CACHE_TTL):
+    return project_tracks(get_json("search", {"t": query, "page": page, "count": count}, limiter=limiter,
+                                   cache_ttl=cache_ttl))
+
+
+def track_to_entry(track):
+    entry = {"title": track.get("title") or track["stream_url"], "url": track["stream_url"]}
+    try:
+        entry["duration"] = int(track["duration"])
+    except (KeyError, TypeError, ValueError):
+        pass
+    user = track.get("user") or {}
+    if user.get("username"):
+        entry["artist"] = user["username"]
+    if track.get("artwork_url"):
+        entry["artwork_url"] = track["artwork_url"]
+    return entry
+
+
+def sample_page(count, rng):
+    # Shaped like a category/search page: the full track record, description and nested user included.
+    page = []
+    for i in range(count):
+        track_id = rng.randrange(10 ** 7)
+        user = {"id": str(rng.randrange(10 ** 6)), "permalink": f"artist{i}", "username": f"Artist {i}",
+                "uri": f"https://api-v2.hearthis.at/artist{i}/", "permalink_url": f"https://hearthis.at/artist{i}/",
+                "avatar_url": f"https://img.hearthis.at/{track_id}/avatar.jpg", "caption": "DJ / producer " * 5}
+        page.append({
+            "id": str(track_id), "created_at": "2024-03-01 12:00:00", "release_date": "2024-03-01 12:00:00",
+            "release_timestamp": 1709294400, "user_id": user["id"], "duration": str(rng.randrange(120, 7200)),
+            "permalink": f"mix-{track_id}", "description": "Recorded live. " * rng.randrange(5, 40),
+            "downloadable": "1", "genre": "Techno", "genre_slush": "techno", "title": f"mtmn-F#-140-200BPM-90.0min {i}",
+            "uri": f"https://api-v2.hearthis.at/artist{i}/mix-{track_id}/",
+            "permalink_url": f"https://hearthis.at/artist{i}/mix-{track_id}/",
+            "thumb": f"https://img.hearthis.at/{track_id}/thumb.jpg",
+            "artwork_url": f"https://img.hearthis.at/{track_id}/300x300.jpg",
+            "artwork_url_retina": f"https://img.hearthis.at/{track_id}/600x600.jpg",
+            "background_url": "", "waveform_data": f"https://hearthis.at/_/wave_image/{track_id}.js",
+            "waveform_url": f"https://img.hearthis.at/wave/{track_id}.png", "user": user,
+            "stream_url": f"https://hearthis.app/artist{i}/mix-{track_id}/listen/?s=abc",
+            "download_url": f"https://hearthis.app/artist{i}/mix-{track_id}/download/?s=abc",
+            "preview_url": f"https://preview.hearthis.at/{track_id}.mp3",
+            "playback_count": str(rng.randrange(10 ** 5)), "download_count": "12", "favoritings_count": "40",
+            "favorited": False, "comment_count": "3", "played": False, "liked": False,
+            "taged": ["techno", "live", "set"], "bpm": "", "key": "", "license": "", "version": "",
+            "type": "", "private": 0, "public": 1,
+        })
+    return json.dumps(page).encode()
+
+
+def run_benchmark(pages, count):
+    rng = random.Random(1)
+    bodies = [sample_page(count, rng) for _ in range(pages)]
+    print(f"{pages} pages of {count} tracks, {sum(map(len, bodies)) / pages / 1024:.1f} KiB per page")
+    backends = [("json", json.loads)] + ([("orjson", orjson.loads)] if orjson else [])
+    for name, decode in backends:
+        for projected in (False, True):
+            tracemalloc.start()
+            started = time.perf_counter()
+            kept = [project_tracks(decode(body)) if projected else decode(body) for body in bodies]
+            elapsed = time.perf_counter() - started
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(f"{name:>6} {'projected' if projected else 'full':>9}: {elapsed / pages * 1000:.2f} ms/page, "
+                  f"{retained / pages / 1024:.1f} KiB retained/page")
+            del kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="hearthis.at API helpers.")
+    parser.add_argument("--benchmark", type=int, metavar="PAGES", help="time decoding and projecting API pages")
+    parser.add_argument("--count", type=int, default=20, help="tracks per benchmark page (default: 20)")
+    args = parser.parse_args()
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.count)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
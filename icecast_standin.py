@@ -0,0 +1,154 @@
+import argparse
+import base64
+import json
+import socketserver
+import threading
+import time
+
+
+class MountStats:
+    def __init__(self, gap_threshold):
+        self.gap_threshold = gap_threshold
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.connections = 0
+        self.first_data = None
+        self.last_data = None
+        self.dead_air = 0.0
+        self.gaps = 0
+        self.connected = False
+
+    def on_connect(self):
+        with self.lock:
+            self.connections += 1
+            self.connected = True
+
+    def on_disconnect(self):
+        with self.lock:
+            self.connected = False
+
+    def on_data(self, n):
+        now = time.monotonic()
+        with self.lock:
+            if self.last_data is not None and now - self.last_data > self.gap_threshold:
+                # Listeners would have heard silence for everything beyond the threshold.
+                self.dead_air += now - self.last_data - self.gap_threshold
+                self.gaps += 1
+            if self.first_data is None:
+                self.first_data = now
+            self.last_data = now
+            self.bytes += n
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = (self.last_data - self.first_data) if self.first_data is not None else 0.0
+            return {
+                "connected": self.connected,
+                "connections": self.connections,
+                "bytes": self.bytes,
+                "seconds": round(elapsed, 3),
+                "throughput_kbps": round(self.bytes * 8 / elapsed / 1000, 1) if elapsed > 0 else 0.0,
+                "gaps": self.gaps,
+                "dead_air_seconds": round(self.dead_air, 3),
+            }
+
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, password, gap_threshold, drop_after=None):
+        super().__init__(address, StandinHandler)
+        self.password = password
+        self.gap_threshold = gap_threshold
+        self.drop_after = drop_after
+        self.mounts = {}
+        self.lock = threading.Lock()
+
+    def mount(self, path):
+        with self.lock:
+            if path not in self.mounts:
+                self.mounts[path] = MountStats(self.gap_threshold)
+            return self.mounts[path]
+
+
+class StandinHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request_line = self.rfile.readline().decode("latin-1").strip()
+        if not request_line:
+            return
+        method, _, rest = request_line.partition(" ")
+        path = rest.split(" ")[0]
+        headers = {}
+        while True:
+            line = self.rfile.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if method == "GET":
+            self.send_status()
+        elif method in ("PUT", "SOURCE"):
+            self.receive_source(path, headers)
+        else:
+            self.wfile.write(b"HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\n\r\n")
+
+    def send_status(self):
+        body = json.dumps({path: stats.snapshot() for path, stats in self.server.mounts.items()}, indent=1).encode()
+        self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+
+    def receive_source(self, path, headers):
+        if self.server.password is not None:
+            expected = base64.b64encode(f"source:{self.server.password}".encode()).decode()
+            if headers.get("authorization") != f"Basic {expected}":
+                self.wfile.write(b"HTTP/1.1 401 Unauthorized\r\nContent-Length: 0\r\n\r\n")
+                return
+
+        stats = self.server.mount(path)
+        stats.on_connect()
+        self.wfile.write(b"HTTP/1.1 200 OK\r\n\r\n")
+        self.wfile.flush()
+        received = 0
+        buffer = memoryview(bytearray(64 * 1024))
+        try:
+            while True:
+                n = self.connection.recv_into(buffer)
+                if not n:
+                    break
+                stats.on_data(n)
+                received += n
+                if self.server.drop_after and received >= self.server.drop_after:
+                    # Simulate the server kicking the source, to exercise reconnects.
+                    break
+        except OSError:
+            pass
+        finally:
+            stats.on_disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minimal Icecast-compatible source endpoint for offline feeder tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--password", default="hackme", help="source password, '' to accept any (default: hackme)")
+    parser.add_argument("--gap-threshold", type=float, default=2.0,
+                        help="seconds without data before it counts as dead air (default: 2)")
+    parser.add_argument("--drop-after", type=int, metavar="BYTES", help="disconnect sources after BYTES to test reconnects")
+    args = parser.parse_args()
+
+    server = StandinServer((args.host, args.port), args.password or None, args.gap_threshold, args.drop_after)
+    print(f"Icecast stand-in on {args.host}:{args.port}, stats at GET /status")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for path, stats in server.mounts.items():
+            print(path, json.dumps(stats.snapshot()))
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
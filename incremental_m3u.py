@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from playlist_convert import M3UWriter, read_txt, report_skipped
+
+TAIL_WINDOW = 64 * 1024
+
+
+def tail_hash(f, offset):
+    # Only the window just before the offset is read, so a check costs the same however long the
+    # playlist gets. Together with the inode it catches a replaced or rewritten source; an edit
+    # further back in a file that is otherwise only appended to goes unnoticed (use --full).
+    start = max(0, offset - TAIL_WINDOW)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+def file_state(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_atomic(path, write, binary=False):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") if binary else open(tmp_path, "w", encoding="utf-8") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def export(source, output, checkpoint_path=None, full=False, on_error=None):
+    checkpoint_path = checkpoint_path or f"{output}.checkpoint"
+    checkpoint = None if full else load_checkpoint(checkpoint_path)
+
+    with open(source, "rb") as src:
+        source_stat = os.fstat(src.fileno())
+        offset = 0
+        if checkpoint and checkpoint.get("source") == os.path.abspath(source):
+            # The checkpoint only holds if the source was appended to and the output is
+            # exactly what we last published; anything else means a full rebuild.
+            if (checkpoint.get("tail_hash")
+                    and checkpoint.get("inode") == source_stat.st_ino
+                    and checkpoint["offset"] <= source_stat.st_size
+                    and os.path.exists(output)
+                    and list(file_state(output)) == [checkpoint["output_size"], checkpoint["output_mtime"]]
+                    and tail_hash(src, checkpoint["offset"]) == checkpoint["tail_hash"]):
+                offset = checkpoint["offset"]
+
+        if offset and offset == source_stat.st_size:
+            return 0
+
+        src.seek(offset)
+        consumed = 0
+        added = 0
+
+        def new_lines():
+            nonlocal consumed
+            for raw in src:
+                # A line still being written has no newline yet; leave it for the next run.
+                if not raw.endswith(b"\n"):
+                    break
+                consumed += len(raw)
+                yield raw.decode("utf-8", errors="replace")
+
+        def write_entries(f):
+            nonlocal added
+            writer = M3UWriter(f, header=not offset)
+            for entry in read_txt(new_lines(), on_error=on_error):
+                writer.write(entry)
+                added += 1
+            writer.close()
+            f.flush()
+            os.fsync(f.fileno())
+
+        if offset:
+            # Append in place; a failed run is cut back to what the checkpoint describes.
+            with open(output, "a", encoding="utf-8") as f:
+                try:
+                    write_entries(f)
+                except BaseException:
+                    f.truncate(checkpoint["output_size"])
+                    # Restore the recorded mtime too, so the next run can still append.
+                    os.utime(f.fileno(), ns=(time.time_ns(), checkpoint["output_mtime"]))
+                    raise
+        else:
+            write_atomic(output, write_entries)
+        new_offset = offset + consumed
+        new_tail = tail_hash(src, new_offset)
+
+    output_size, output_mtime = file_state(output)
+    write_atomic(checkpoint_path, lambda f: json.dump({
+        "source": os.path.abspath(source),
+        "inode": source_stat.st_ino,
+        "offset": new_offset,
+        "tail_hash": new_tail,
+        "output_size": output_size,
+        "output_mtime": output_mtime,
+    }, f))
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep an M3U in sync with a tab-separated playlist, appending only new entries.")
+    parser.add_argument("source", nargs="?", default="playlist.txt")
+    parser.add_argument("output", nargs="?", default="Playlist.m3u")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--full", action="store_true", help="ignore the checkpoint and rebuild")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="keep running and re-check every SECONDS")
+    args = parser.parse_args()
+
+    while True:
+        started = time.perf_counter()
+        try:
+            added = export(args.source, args.output, args.checkpoint, args.full, on_error=report_skipped)
+        except OSError as e:
+            print(f"Error exporting playlist: {e}", file=sys.stderr)
+            added = 0
+        if added:
+            print(f"Added {added} entries to {args.output} in {(time.perf_counter() - started) * 1000:.1f} ms")
+        if not args.watch:
+            break
+        args.full = False
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
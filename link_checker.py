@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from hearthis_api import session
+from incremental_m3u import load_checkpoint, write_atomic
+from playlist_convert import READERS, WRITERS, detect_format, read_entries, report_skipped
+from playlist_dedup import canonical_url
+
+DEAD_STATUSES = {404, 410}
+
+
+def probe(url, timeout=15):
+    try:
+        response = session().head(url, allow_redirects=True, timeout=timeout)
+        if response.status_code in (403, 405, 501):
+            # Some CDNs refuse HEAD; a one-byte range request answers the same question.
+            response = session().get(url, headers={"Range": "bytes=0-0"}, allow_redirects=True,
+                                     timeout=timeout, stream=True)
+            response.close()
+    except requests.RequestException as e:
+        return {"status": "error", "error": str(e)}
+    if response.status_code in DEAD_STATUSES:
+        return {"status": "dead", "code": response.status_code}
+    if response.status_code < 400:
+        return {"status": "ok", "code": response.status_code}
+    return {"status": "error", "code": response.status_code}
+
+
+class LinkChecker:
+    def __init__(self, cache_path=".link_cache.json", ttl=24 * 3600, concurrency=64, per_host=16, timeout=15):
+        self.cache_path = cache_path
+        self.cache = load_checkpoint(cache_path) or {}
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.host_limits = {}
+        self.stats = {"checked": 0, "cached": 0, "ok": 0, "dead": 0, "error": 0}
+
+    def fresh(self, key, now):
+        record = self.cache.get(key)
+        return record is not None and now - record["checked"] < self.ttl
+
+    async def check_one(self, key, url, limit):
+        host = urlsplit(url).hostname or ""
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(self.per_host)
+        async with limit, self.host_limits[host]:
+            result = await asyncio.to_thread(probe, url, self.timeout)
+        self.stats["checked"] += 1
+        if result["status"] != "error":
+            # Transient failures are not cached, so the next run tries them again.
+            self.cache[key] = dict(result, checked=time.time())
+        return key, result
+
+    async def check(self, entries):
+        now = time.time()
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency))
+        limit = asyncio.Semaphore(self.concurrency)
+        results = {}
+        tasks = {}
+        for entry in entries:
+            key = canonical_url(entry["url"])
+            if key in results or key in tasks:
+                continue
+            if self.fresh(key, now):
+                results[key] = self.cache[key]
+                self.stats["cached"] += 1
+            else:
+                tasks[key] = self.check_one(key, entry["url"], limit)
+        for key, result in await asyncio.gather(*tasks.values()):
+            results[key] = result
+        for result in results.values():
+            self.stats[result["status"]] += 1
+        return results
+
+    def save(self):
+        write_atomic(self.cache_path, lambda f: json.dump(self.cache, f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe every playlist entry and write a playlist without the dead ones.")
+    parser.add_argument("input")
+    parser.add_argument("output", nargs="?", help="pruned playlist (default: rewrite the input)")
+    parser.add_argument("--from", dest="src_format", choices=READERS)
+    parser.add_argument("--to", dest="dst_format", choices=WRITERS)
+    parser.add_argument("--report", help="write dead and failing entries as JSON Lines")
+    parser.add_argument("--cache", default=".link_cache.json", help="result cache (default: .link_cache.json)")
+    parser.add_argument("--ttl", type=float, default=24, help="hours before a cached result is rechecked (default: 24)")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight (default: 64)")
+    parser.add_argument("--per-host", type=int, default=16, help="requests in flight per host (default: 16)")
+    parser.add_argument("--timeout", type=float, default=15)
+    parser.add_argument("--dry-run", action="store_true", help="only report, do not write a playlist")
+    args = parser.parse_args()
+
+    try:
+        src_format = args.src_format or detect_format(args.input)
+        dst_format = args.dst_format or (detect_format(args.output) if args.output else src_format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    checker = LinkChecker(args.cache, args.ttl * 3600, args.concurrency, args.per_host, args.timeout)
+    entries = list(read_entries(args.input, src_format, on_error=report_skipped))
+    results = asyncio.run(checker.check(entries))
+    checker.save()
+
+    report = open(args.report, "w", encoding="utf-8") if args.report else None
+    kept = 0
+    target = args.output or args.input
+    tmp_path = f"{target}.tmp"
+    out = None if args.dry_run else open(tmp_path, "w", encoding="utf-8")
+    writer = WRITERS[dst_format](out) if out else None
+    for entry in entries:
+        result = results[canonical_url(entry["url"])]
+        if result["status"] != "ok" and report:
+            report.write(json.dumps(dict(entry, **result)) + "\n")
+        if result["status"] == "dead":
+            continue
+        kept += 1
+        if writer:
+            writer.write(entry)
+    if writer:
+        writer.close()
+        out.close()
+        os.replace(tmp_path, target)
+    if report:
+        report.close()
+
+    stats = checker.stats
+    print(f"{len(entries)} entries, {len(results)} unique URLs: {stats['checked']} probed, {stats['cached']} cached; "
+          f"{stats['ok']} ok, {stats['dead']} dead, {stats['error']} errors (kept). "
+          f"Kept {kept} entries in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from hearthis_api import RateLimiter, get_json
+from playlist_convert import READERS, WRITERS, detect_format, read_entries, report_skipped
+from playlist_dedup import canonical_url
+
+BATCH_SIZE = 500
+
+
+class MetadataCache:
+    def __init__(self, path=".metadata_cache.jsonl"):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self.entries[record["url"]] = record
+                    except (ValueError, KeyError):
+                        continue
+        self.f = open(path, "a", encoding="utf-8")
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def set(self, url, record):
+        record["url"] = url
+        self.entries[url] = record
+        self.f.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.f.close()
+
+
+def lookup_track(url, limiter=None):
+    segments = [s for s in urlsplit(url).path.split("/") if s]
+    if len(segments) != 2:
+        return {"missing": True}
+    try:
+        track = get_json(f"{segments[0]}/{segments[1]}/", limiter=limiter)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return {"missing": True}
+        raise
+    if not isinstance(track, dict) or not track.get("id"):
+        return {"missing": True}
+
+    record = {}
+    try:
+        record["duration"] = int(track["duration"])
+    except (KeyError, TypeError, ValueError):
+        pass
+    user = track.get("user") or {}
+    if user.get("username"):
+        record["artist"] = user["username"]
+    if track.get("artwork_url"):
+        record["artwork_url"] = track["artwork_url"]
+    return record
+
+
+def backfill(entries, cache, parallel=8, rate=10.0, fields=("duration",)):
+    limiter = RateLimiter(rate)
+    stats = {"entries": 0, "cached": 0, "fetched": 0, "failed": 0}
+
+    def needs_lookup(entry):
+        return any(entry.get(field) is None for field in fields)
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        batch = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= BATCH_SIZE:
+                yield from fill_batch(batch, cache, executor, limiter, fields, needs_lookup, stats)
+                batch = []
+        if batch:
+            yield from fill_batch(batch, cache, executor, limiter, fields, needs_lookup, stats)
+    print(f"{stats['entries']} entries, {stats['cached']} from cache, {stats['fetched']} looked up, "
+          f"{stats['failed']} failed", file=sys.stderr)
+
+
+def fill_batch(batch, cache, executor, limiter, fields, needs_lookup, stats):
+    keys = [canonical_url(entry["url"]) if needs_lookup(entry) else None for entry in batch]
+    missing = {key for key in keys if key and cache.get(key) is None}
+    futures = {key: executor.submit(lookup_track, key, limiter) for key in missing}
+
+    for key, future in futures.items():
+        try:
+            cache.set(key, future.result())
+            stats["fetched"] += 1
+        except requests.RequestException as e:
+            # Not cached, so the next run retries it.
+            print(f"Error looking up {key}: {e}", file=sys.stderr)
+            stats["failed"] += 1
+
+    for entry, key in zip(batch, keys):
+        stats["entries"] += 1
+        record = cache.get(key) if key else None
+        if record:
+            if key not in futures:
+                stats["cached"] += 1
+            for field in fields:
+                if entry.get(field) is None and record.get(field) is not None:
+                    entry[field] = record[field]
+        yield entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill in track durations (and optionally artist/artwork) from the hearthis API.")
+    parser.add_argument("input")
+    parser.add_argument("output", help="output playlist, usually an extended .m3u")
+    parser.add_argument("--from", dest="src_format", choices=READERS)
+    parser.add_argument("--to", dest="dst_format", choices=WRITERS)
+    parser.add_argument("--artist", action="store_true", help="also fill in the artist")
+    parser.add_argument("--artwork", action="store_true", help="also fill in the artwork URL")
+    parser.add_argument("--cache", default=".metadata_cache.jsonl", help="lookup cache (default: .metadata_cache.jsonl)")
+    parser.add_argument("--parallel", type=int, default=8, help="concurrent lookups (default: 8)")
+    parser.add_argument("--rate", type=float, default=10.0, help="lookups per second (default: 10)")
+    args = parser.parse_args()
+
+    fields = ["duration"]
+    if args.artist:
+        fields.append("artist")
+    if args.artwork:
+        fields.append("artwork_url")
+
+    started = time.perf_counter()
+    cache = MetadataCache(args.cache)
+    try:
+        src_format = args.src_format or detect_format(args.input)
+        dst_format = args.dst_format or detect_format(args.output)
+        entries = backfill(read_entries(args.input, src_format, on_error=report_skipped),
+                           cache, args.parallel, args.rate, fields)
+        tmp_path = f"{args.output}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            writer = WRITERS[dst_format](f)
+            for entry in entries:
+                writer.write(entry)
+            writer.close()
+        os.replace(tmp_path, args.output)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        cache.close()
+    print(f"Wrote {args.output} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
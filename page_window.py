@@ -0,0 +1,218 @@
+import hashlib
+import os
+import resource
+import sys
+import tempfile
+from qtpy.QtCore import Qt, QObject, Signal
+from qtpy.QtWidgets import QListWidgetItem, QAbstractItemView
+from genre_cache import GenreCache
+
+
+def track_bytes(track):
+    size = sys.getsizeof(track)
+    for key, value in track.items():
+        size += sys.getsizeof(key) + sys.getsizeof(value)
+        if isinstance(value, dict):
+            size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return size
+
+
+def process_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current, but better than nothing off Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PageWindow:
+    # Pages of one browsing source (a search, an artist feed): a few stay in memory,
+    # the rest are spilled to the page cache and read back when needed again.
+    def __init__(self, max_pages=5, max_bytes=32 * 1024 * 1024, cache=None):
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        if cache is None:
+            # Spilled pages belong to this process only; other players must not see or delete them.
+            self.spill_dir = tempfile.TemporaryDirectory(prefix="hearthis-pages-")
+            cache = GenreCache(self.spill_dir.name)
+        self.cache = cache
+        self.key = None
+        self.pages = {}
+        self.sizes = {}
+        self.spilled = set()
+
+    def reset(self, key):
+        self.key = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        self.pages.clear()
+        self.sizes.clear()
+        self.spilled.clear()
+        for path in self.cache.cache_dir.glob(f"{self.key}_page*.json"):
+            path.unlink()
+
+    def add(self, page, tracks):
+        self.pages[page] = tracks
+        self.sizes[page] = sum(track_bytes(track) for track in tracks)
+
+    def load(self, page):
+        if page in self.pages:
+            return self.pages[page]
+        if page in self.spilled:
+            tracks = self.cache.get(self.key, page)
+            if tracks is not None:
+                self.add(page, tracks)
+            return tracks
+        return None
+
+    def evict(self, page):
+        tracks = self.pages.pop(page)
+        self.sizes.pop(page)
+        if page not in self.spilled:
+            self.cache.set(self.key, page, tracks)
+            self.spilled.add(page)
+
+    def resident_bytes(self):
+        return sum(self.sizes.values())
+
+    def over_budget(self):
+        return len(self.pages) > self.max_pages or (len(self.pages) > 2 and self.resident_bytes() > self.max_bytes)
+
+    def usage(self):
+        return {
+            "resident_pages": len(self.pages),
+            "resident_tracks": sum(len(tracks) for tracks in self.pages.values()),
+            "resident_bytes": self.resident_bytes(),
+            "max_bytes": self.max_bytes,
+            "spilled_pages": len(self.spilled - set(self.pages)),
+            "rss": process_rss(),
+        }
+
+
+class WindowedList(QObject):
+    # Keeps a QListWidget (and its parallel (title, track) list) showing a contiguous run of
+    # pages: scrolling down fetches the next page and drops the top one, scrolling back up
+    # restores dropped pages from the spill cache without touching the network.
+    usage_changed = Signal(str)
+
+    def __init__(self, list_widget, rows, max_pages=5, max_bytes=32 * 1024 * 1024, cache=None, parent=None):
+        super().__init__(parent)
+        self.list_widget = list_widget
+        self.rows = rows
+        self.window = PageWindow(max_pages, max_bytes, cache)
+        self.fetch = None
+        self.counts = {}
+        self.first = 1
+        self.last = 0
+        self.last_page = None
+        self.loading = None
+        list_widget.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+
+    def set_max_bytes(self, max_bytes):
+        self.window.max_bytes = max_bytes
+        self.trim(keep_bottom=True)
+        self.report()
+
+    def start(self, key, fetch):
+        self.fetch = None
+        self.list_widget.clear()
+        del self.rows[:]
+        self.window.reset(key)
+        self.counts = {}
+        self.first = 1
+        self.last = 0
+        self.last_page = None
+        self.loading = None
+        self.fetch = fetch
+        self.request(1)
+
+    def stop(self):
+        self.fetch = None
+        self.loading = None
+
+    def request(self, page):
+        tracks = self.window.load(page)
+        if tracks is not None:
+            self.show_page(page, tracks)
+            return
+        self.loading = page
+        self.fetch(page)
+
+    def page_loaded(self, page, tracks, last=False):
+        if self.fetch is None or page != self.loading:
+            return
+        self.loading = None
+        if last:
+            self.last_page = page
+        self.window.add(page, tracks)
+        self.show_page(page, tracks)
+
+    def page_failed(self, page):
+        if page == self.loading:
+            self.loading = None
+
+    def show_page(self, page, tracks):
+        anchor = self.list_widget.itemAt(0, 0)
+        self.list_widget.setUpdatesEnabled(False)
+        # Removing or inserting rows must not move the current item; that would start playback.
+        self.list_widget.blockSignals(True)
+        new_rows = self.page_rows(tracks)
+        if page == self.last + 1:
+            for title, track in new_rows:
+                item = QListWidgetItem(title)
+                item.setData(Qt.UserRole, track)
+                self.list_widget.addItem(item)
+            self.rows += new_rows
+            self.last = page
+            self.counts[page] = len(new_rows)
+            self.trim(keep_bottom=True)
+        elif page == self.first - 1:
+            for row, (title, track) in enumerate(new_rows):
+                item = QListWidgetItem(title)
+                item.setData(Qt.UserRole, track)
+                self.list_widget.insertItem(row, item)
+            self.rows[0:0] = new_rows
+            self.first = page
+            self.counts[page] = len(new_rows)
+            self.trim(keep_bottom=False)
+        self.list_widget.blockSignals(False)
+        self.list_widget.setUpdatesEnabled(True)
+        if anchor is not None and self.list_widget.row(anchor) >= 0:
+            self.list_widget.scrollToItem(anchor, QAbstractItemView.PositionAtTop)
+        self.report()
+        # Keep going until the list can scroll at all.
+        self.on_scrolled(self.list_widget.verticalScrollBar().value())
+
+    def page_rows(self, tracks):
+        return [(track["title"], track) for track in tracks if isinstance(track, dict) and track.get("title")]
+
+    def trim(self, keep_bottom):
+        while self.window.over_budget() and self.last > self.first:
+            if keep_bottom:
+                page, self.first = self.first, self.first + 1
+                start = 0
+            else:
+                page, self.last = self.last, self.last - 1
+                start = len(self.rows) - self.counts[page]
+            for _ in range(self.counts[page]):
+                self.list_widget.takeItem(start)
+            del self.rows[start:start + self.counts[page]]
+            self.window.evict(page)
+
+    def on_scrolled(self, value):
+        if self.fetch is None or self.loading is not None:
+            return
+        scrollbar = self.list_widget.verticalScrollBar()
+        if value >= scrollbar.maximum() - scrollbar.pageStep():
+            if self.last_page is None or self.last < self.last_page:
+                self.request(self.last + 1)
+        elif value <= scrollbar.singleStep() and self.first > 1:
+            self.request(self.first - 1)
+
+    def usage_text(self):
+        usage = self.window.usage()
+        return (f"Pages {self.first}-{self.last} in memory ({usage['resident_tracks']} tracks, "
+                f"{usage['resident_bytes'] / 2 ** 20:.1f} of {usage['max_bytes'] / 2 ** 20:.0f} MB), "
+                f"{usage['spilled_pages']} spilled · process {usage['rss'] / 2 ** 20:.0f} MB")
+
+    def report(self):
+        self.usage_changed.emit(self.usage_text())
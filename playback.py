@@ -0,0 +1,152 @@
+import time
+import requests
+
+
+class PlaybackProfile:
+    def __init__(self, name, startup_buffer, rebuffer_buffer, min_buffer, max_buffer,
+                 probe_bytes, variant_keys):
+        self.name = name
+        # Buffer levels are QMediaPlayer.bufferStatus() percentages.
+        self.startup_buffer = startup_buffer
+        self.rebuffer_buffer = rebuffer_buffer
+        self.min_buffer = min_buffer
+        self.max_buffer = max_buffer
+        self.probe_bytes = probe_bytes
+        # The first key present in the track dict is used as the stream URL.
+        self.variant_keys = variant_keys
+
+    def select_stream_url(self, track):
+        for key in self.variant_keys:
+            url = track.get(key)
+            if url:
+                return url
+        return track.get("stream_url")
+
+    def adapt(self, throughput, bitrate):
+        # Scale the startup buffer with how close the link is to the stream bitrate:
+        # twice the bitrate or better needs only min_buffer, at or below it needs max_buffer.
+        if not throughput or not bitrate:
+            return self.startup_buffer
+        ratio = bitrate / throughput
+        weight = min(max((ratio - 0.5) / 0.5, 0.0), 1.0)
+        return int(self.min_buffer + (self.max_buffer - self.min_buffer) * weight)
+
+
+PROFILES = {
+    "default": PlaybackProfile(
+        "default",
+        startup_buffer=10,
+        rebuffer_buffer=30,
+        min_buffer=5,
+        max_buffer=50,
+        probe_bytes=128 * 1024,
+        variant_keys=("stream_url",),
+    ),
+    "low-bandwidth": PlaybackProfile(
+        "low-bandwidth",
+        startup_buffer=40,
+        rebuffer_buffer=70,
+        min_buffer=25,
+        max_buffer=95,
+        probe_bytes=64 * 1024,
+        variant_keys=("low_stream_url", "stream_url_low", "preview_stream_url", "stream_url"),
+    ),
+}
+
+
+def track_duration_ms(track):
+    # The API reports "duration" in seconds; QMediaPlayer works in milliseconds. 0 when unknown.
+    try:
+        return int(float(track.get("duration") or 0) * 1000)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ThroughputEstimator:
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.bytes_per_second = None
+
+    def add_sample(self, num_bytes, seconds):
+        if num_bytes <= 0 or seconds <= 0:
+            return self.bytes_per_second
+        sample = num_bytes / seconds
+        if self.bytes_per_second is None:
+            self.bytes_per_second = sample
+        else:
+            self.bytes_per_second = self.alpha * sample + (1 - self.alpha) * self.bytes_per_second
+        return self.bytes_per_second
+
+
+class StallTracker:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.durations = []
+        self.stall_started = None
+
+    def start(self):
+        if self.stall_started is None:
+            self.stall_started = time.monotonic()
+
+    def end(self):
+        if self.stall_started is None:
+            return None
+        duration = time.monotonic() - self.stall_started
+        self.stall_started = None
+        self.durations.append(duration)
+        return duration
+
+    @property
+    def is_stalled(self):
+        return self.stall_started is not None
+
+    @property
+    def count(self):
+        return len(self.durations) + (1 if self.is_stalled else 0)
+
+    @property
+    def total(self):
+        total = sum(self.durations)
+        if self.stall_started is not None:
+            total += time.monotonic() - self.stall_started
+        return total
+
+    def summary(self):
+        return f"stalls {self.count} ({self.total:.1f}s)"
+
+
+def probe_stream(url, probe_bytes, timeout=10):
+    # Fetch the first probe_bytes of the stream to measure throughput and learn its size.
+    headers = {"Range": f"bytes=0-{probe_bytes - 1}"}
+    started = time.monotonic()
+    received = 0
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        total_size = None
+        content_range = response.headers.get("Content-Range", "")
+        if "/" in content_range:
+            size = content_range.rsplit("/", 1)[1]
+            if size.isdigit():
+                total_size = int(size)
+        elif response.status_code == 200 and response.headers.get("Content-Length", "").isdigit():
+            total_size = int(response.headers["Content-Length"])
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            received += len(chunk)
+            if received >= probe_bytes:
+                break
+    return received, time.monotonic() - started, total_size
+
+
+def prefetch_range(url, start, length, timeout=10):
+    # Pull a byte window through the CDN so a following seek into it is served warm.
+    headers = {"Range": f"bytes={start}-{start + length - 1}"}
+    received = 0
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=32 * 1024):
+            received += len(chunk)
+            if received >= length:
+                break
+    return received
@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+XSPF_NS = "{http://xspf.org/ns/0/}"
+BUFFER_SIZE = 1024 * 1024
+
+# Entries are plain dicts: "title" and "url" always, "duration" (seconds),
+# "artist" and "artwork_url" when known.
+
+
+def parse_duration(value):
+    try:
+        duration = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return duration if duration >= 0 else None
+
+
+def read_txt(f, on_error=None):
+    for line_no, line in enumerate(f, 1):
+        line = line.rstrip("\r\n")
+        if not line:
+            continue
+        parts = line.split("\t")
+        if len(parts) < 2 or not parts[1].strip():
+            if on_error:
+                on_error(line_no, line)
+            continue
+        entry = {"title": parts[0].strip(), "url": parts[1].strip()}
+        if len(parts) > 2:
+            duration = parse_duration(parts[2])
+            if duration is not None:
+                entry["duration"] = duration
+        yield entry
+
+
+def read_m3u(f, on_error=None):
+    pending = {}
+    for line in f:
+        line = line.strip()
+        if not line or line == "#EXTM3U":
+            continue
+        if line.startswith("#EXTINF:"):
+            info, _, title = line[8:].partition(",")
+            pending = {"title": title.strip()}
+            duration = parse_duration(info.split()[0] if info.split() else None)
+            if duration is not None:
+                pending["duration"] = duration
+        elif line.startswith("#EXTART:"):
+            pending["artist"] = line[8:].strip()
+        elif line.startswith("#EXTIMG:"):
+            pending["artwork_url"] = line[8:].strip()
+        elif line.startswith("#"):
+            continue
+        else:
+            entry = pending
+            entry.setdefault("title", line)
+            entry["url"] = line
+            pending = {}
+            yield entry
+
+
+def read_xspf(f, on_error=None):
+    track_list = None
+    for event, elem in ET.iterparse(f, events=("start", "end")):
+        if event == "start":
+            if elem.tag == f"{XSPF_NS}trackList":
+                track_list = elem
+            continue
+        if elem.tag != f"{XSPF_NS}track":
+            continue
+        url = elem.findtext(f"{XSPF_NS}location")
+        if url:
+            url = url.strip()
+            entry = {"title": (elem.findtext(f"{XSPF_NS}title") or url).strip(), "url": url}
+            duration = parse_duration(elem.findtext(f"{XSPF_NS}duration"))
+            if duration is not None:
+                entry["duration"] = duration // 1000
+            creator = elem.findtext(f"{XSPF_NS}creator")
+            if creator:
+                entry["artist"] = creator.strip()
+            image = elem.findtext(f"{XSPF_NS}image")
+            if image:
+                entry["artwork_url"] = image.strip()
+            yield entry
+        # Drop parsed tracks so memory stays flat on large files.
+        elem.clear()
+        if track_list is not None:
+            track_list.remove(elem)
+
+
+def read_jsonl(f, on_error=None):
+    for line_no, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            entry = None
+        if not isinstance(entry, dict) or not entry.get("url"):
+            if on_error:
+                on_error(line_no, line.rstrip("\n"))
+            continue
+        entry.setdefault("title", entry["url"])
+        yield entry
+
+
+def one_line(text):
+    # Line-based formats end an entry at the first newline, so titles must not contain one.
+    return text.replace("\r\n", " ").replace("\r", " ").replace("\n", " ")
+
+
+class TxtWriter:
+    def __init__(self, f, header=True):
+        self.f = f
+
+    def write(self, entry):
+        title = one_line(entry["title"]).replace("\t", " ")
+        if entry.get("duration") is not None:
+            self.f.write(f"{title}\t{entry['url']}\t{entry['duration']}\n")
+        else:
+            self.f.write(f"{title}\t{entry['url']}\n")
+
+    def close(self):
+        pass
+
+
+class M3UWriter:
+    def __init__(self, f, header=True):
+        self.f = f
+        if header:
+            f.write("#EXTM3U\n")
+
+    def write(self, entry):
+        duration = entry.get("duration")
+        lines = f"#EXTINF:{-1 if duration is None else duration},{one_line(entry['title'])}\n"
+        if entry.get("artist"):
+            lines += f"#EXTART:{one_line(entry['artist'])}\n"
+        if entry.get("artwork_url"):
+            lines += f"#EXTIMG:{entry['artwork_url']}\n"
+        self.f.write(lines + f"{entry['url']}\n")
+
+    def close(self):
+        pass
+
+
+class XSPFWriter:
+    def __init__(self, f, header=True):
+        self.f = f
+        if header:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<playlist version="1" xmlns="http://xspf.org/ns/0/">\n  <trackList>\n')
+
+    def write(self, entry):
+        parts = [f"    <track><location>{escape(entry['url'])}</location><title>{escape(entry['title'])}</title>"]
+        if entry.get("artist"):
+            parts.append(f"<creator>{escape(entry['artist'])}</creator>")
+        if entry.get("duration") is not None:
+            parts.append(f"<duration>{int(entry['duration']) * 1000}</duration>")
+        if entry.get("artwork_url"):
+            parts.append(f"<image>{escape(entry['artwork_url'])}</image>")
+        parts.append("</track>\n")
+        self.f.write("".join(parts))
+
+    def close(self):
+        self.f.write("  </trackList>\n</playlist>\n")
+
+
+class JSONLWriter:
+    def __init__(self, f, header=True):
+        self.f = f
+
+    def write(self, entry):
+        self.f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def close(self):
+        pass
+
+
+READERS = {
+    "txt": read_txt,
+    "m3u": read_m3u,
+    "xspf": read_xspf,
+    "jsonl": read_jsonl,
+}
+
+WRITERS = {
+    "txt": TxtWriter,
+    "m3u": M3UWriter,
+    "xspf": XSPFWriter,
+    "jsonl": JSONLWriter,
+}
+
+EXTENSIONS = {
+    ".txt": "txt",
+    ".m3u": "m3u",
+    ".m3u8": "m3u",
+    ".xspf": "xspf",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+
+def detect_format(path):
+    fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Cannot tell playlist format of {path}, pass it explicitly")
+    return fmt
+
+
+def open_input(path, fmt):
+    # ElementTree wants bytes for XSPF; everything else is read as text.
+    if fmt == "xspf":
+        return sys.stdin.buffer if path == "-" else open(path, "rb", buffering=BUFFER_SIZE)
+    if path == "-":
+        return sys.stdin
+    return open(path, "r", encoding="utf-8", errors="replace", buffering=BUFFER_SIZE)
+
+
+def read_entries(path, fmt=None, on_error=None):
+    fmt = fmt or detect_format(path)
+    f = open_input(path, fmt)
+    try:
+        yield from READERS[fmt](f, on_error=on_error)
+    finally:
+        if f not in (sys.stdin, sys.stdin.buffer):
+            f.close()
+
+
+def write_entries(entries, f, fmt):
+    writer = WRITERS[fmt](f)
+    count = 0
+    for entry in entries:
+        writer.write(entry)
+        count += 1
+    writer.close()
+    return count
+
+
+def convert(src, dst, src_format=None, dst_format=None, on_error=None):
+    src_format = src_format or detect_format(src)
+    dst_format = dst_format or detect_format(dst)
+    entries = read_entries(src, src_format, on_error=on_error)
+    if dst == "-":
+        return write_entries(entries, sys.stdout, dst_format)
+    with open(dst, "w", encoding="utf-8", buffering=BUFFER_SIZE) as f:
+        return write_entries(entries, f, dst_format)
+
+
+def report_skipped(line_no, line):
+    print(f"Skipping malformed line {line_no}: {line[:80]!r}", file=sys.stderr)
+
+
+def run_benchmark(lines):
+    import resource
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src = os.path.join(tmp_dir, "bench.txt")
+        with open(src, "w", buffering=BUFFER_SIZE) as f:
+            for i in range(lines):
+                f.write(f"mtmn-F#-140-200BPM-{i % 120}.0min\thttps://hearthis.app/mtmn/track-{i}/listen/?s={i:x}\n")
+        print(f"{lines} input lines, {os.path.getsize(src) / 1e6:.1f} MB")
+
+        previous = src
+        for fmt in ("m3u", "xspf", "jsonl", "txt"):
+            dst = os.path.join(tmp_dir, f"bench.{fmt}")
+            started = time.perf_counter()
+            count = convert(previous, dst)
+            elapsed = time.perf_counter() - started
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{os.path.basename(previous):>12} -> {fmt:<5} {count} entries in {elapsed:.2f}s "
+                  f"({count / elapsed:,.0f}/s), peak RSS {peak_mb:.0f} MB")
+            previous = dst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert playlists between txt, M3U, XSPF and JSON Lines.")
+    parser.add_argument("input", nargs="?", help="input playlist, '-' for stdin")
+    parser.add_argument("output", nargs="?", help="output playlist, '-' for stdout")
+    parser.add_argument("--from", dest="src_format", choices=READERS, help="input format (default: by extension)")
+    parser.add_argument("--to", dest="dst_format", choices=WRITERS, help="output format (default: by extension)")
+    parser.add_argument("--benchmark", type=int, metavar="LINES", help="time a conversion chain over LINES generated lines")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+        return
+    if not args.input or not args.output:
+        parser.error("input and output are required")
+
+    try:
+        count = convert(args.input, args.output, args.src_format, args.dst_format, on_error=report_skipped)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Converted {count} entries to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import hashlib
+import os
+import sys
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from playlist_convert import READERS, WRITERS, detect_format, read_entries, report_skipped
+
+HEARTHIS_HOSTS = {"hearthis.at", "hearthis.app"}
+# Per-share tokens that do not change which track a URL points at.
+SHARE_PARAMS = {"s", "ref", "utm_source", "utm_medium", "utm_campaign"}
+
+
+def canonical_url(url):
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+
+    if host not in HEARTHIS_HOSTS:
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ""))
+
+    segments = [s for s in parts.path.lower().split("/") if s]
+    # The track page and its /listen/ stream are the same track.
+    if segments and segments[-1] == "listen":
+        segments.pop()
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in SHARE_PARAMS)
+    return urlunsplit(("https", "hearthis.at", "/" + "/".join(segments) + "/", urlencode(query), ""))
+
+
+class Deduplicator:
+    def __init__(self):
+        # 16-byte digests keep the index small even for millions of URLs.
+        self.index = set()
+        self.duplicates = 0
+
+    def is_new(self, url):
+        digest = hashlib.blake2b(canonical_url(url).encode("utf-8"), digest_size=16).digest()
+        if digest in self.index:
+            self.duplicates += 1
+            return False
+        self.index.add(digest)
+        return True
+
+    def filter(self, entries, key=lambda entry: entry["url"]):
+        for entry in entries:
+            if self.is_new(key(entry)):
+                yield entry
+
+
+def dedupe_file(src, dst=None, src_format=None, dst_format=None, on_error=None):
+    src_format = src_format or detect_format(src)
+    dst_format = dst_format or (detect_format(dst) if dst else src_format)
+    # Without an output file the input is replaced atomically.
+    target = dst or src
+    tmp_path = f"{target}.tmp"
+    dedup = Deduplicator()
+    with open(tmp_path, "w", encoding="utf-8", buffering=1024 * 1024) as f:
+        writer = WRITERS[dst_format](f)
+        kept = 0
+        for entry in dedup.filter(read_entries(src, src_format, on_error=on_error)):
+            writer.write(entry)
+            kept += 1
+        writer.close()
+    os.replace(tmp_path, target)
+    return kept, dedup.duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove duplicate tracks from a playlist by canonical hearthis URL.")
+    parser.add_argument("input")
+    parser.add_argument("output", nargs="?", help="output playlist (default: rewrite the input)")
+    parser.add_argument("--from", dest="src_format", choices=READERS)
+    parser.add_argument("--to", dest="dst_format", choices=WRITERS)
+    args = parser.parse_args()
+
+    try:
+        kept, removed = dedupe_file(args.input, args.output, args.src_format, args.dst_format, on_error=report_skipped)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Kept {kept} entries, removed {removed} duplicates", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
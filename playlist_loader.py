@@ -0,0 +1,50 @@
+import mmap
+import os
+from PyQt5.QtCore import QThread, pyqtSignal
+from playlist_convert import read_txt
+from playlist_dedup import Deduplicator
+
+
+class PlaylistLoader(QThread):
+    rows_loaded = pyqtSignal(list)
+    loading_finished = pyqtSignal(int, int, list)
+
+    def __init__(self, file_path, batch_size=2000, dedupe=True, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.dedupe = dedupe
+
+    def lines(self, mm):
+        for raw in iter(mm.readline, b""):
+            yield raw.decode("utf-8", errors="replace")
+
+    def run(self):
+        skipped = []
+        dedup = Deduplicator() if self.dedupe else None
+        loaded = 0
+        batch = []
+
+        try:
+            with open(self.file_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        on_error = lambda line_no, line: skipped.append((line_no, line))
+                        for entry in read_txt(self.lines(mm), on_error=on_error):
+                            if dedup and not dedup.is_new(entry["url"]):
+                                continue
+                            # Only strings cross to the GUI thread; QMediaContent is built on play.
+                            batch.append((entry["title"], entry["url"]))
+                            if len(batch) >= self.batch_size:
+                                if self.isInterruptionRequested():
+                                    return
+                                loaded += len(batch)
+                                self.rows_loaded.emit(batch)
+                                batch = []
+        except OSError as e:
+            print(f"Error loading playlist: {e}")
+
+        if batch:
+            loaded += len(batch)
+            self.rows_loaded.emit(batch)
+        self.loading_finished.emit(loaded, dedup.duplicates if dedup else 0, skipped)
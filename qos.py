@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+
+TTFA_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+class TrackSession:
+    def __init__(self, track, stream_url):
+        self.track_id = track.get("id")
+        self.title = track.get("title")
+        self.stream_url = stream_url
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.time_to_buffered = None
+        self.time_to_first_audio = None
+        self.bytes_downloaded = 0
+        self.stream_size = None
+        self.duration = None
+        self.furthest_position = 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def estimated_bytes(self):
+        # QMediaPlayer does not expose its byte counters, so the player's own download
+        # is estimated from the furthest position reached.
+        played = 0
+        if self.stream_size and self.duration:
+            played = int(self.stream_size * min(self.furthest_position / self.duration, 1.0))
+        return self.bytes_downloaded + played
+
+    def to_record(self, stalls):
+        return {
+            "track_id": self.track_id,
+            "title": self.title,
+            "stream_url": self.stream_url,
+            "started_at": self.started_at,
+            "time_to_buffered": self.time_to_buffered,
+            "time_to_first_audio": self.time_to_first_audio,
+            "stalls": stalls.count,
+            "stalled_seconds": round(stalls.total, 3),
+            "stall_durations": [round(d, 3) for d in stalls.durations],
+            "bytes_downloaded": self.estimated_bytes(),
+            "session_seconds": round(self.elapsed(), 3),
+        }
+
+
+class QoSRecorder:
+    def __init__(self, jsonl_path="qos_metrics.jsonl", prom_path="qos_metrics.prom"):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.lock = threading.Lock()
+        self.session = None
+        self.tracks_started = 0
+        self.tracks_without_audio = 0
+        self.stalls_total = 0
+        self.stalled_seconds_total = 0.0
+        self.bytes_total = 0
+        self.ttfa_counts = [0] * len(TTFA_BUCKETS)
+        self.ttfa_count = 0
+        self.ttfa_sum = 0.0
+
+    def start_track(self, track, stream_url, stalls):
+        self.finish(stalls)
+        with self.lock:
+            self.session = TrackSession(track, stream_url)
+            self.tracks_started += 1
+
+    def mark_buffered(self):
+        session = self.session
+        if session and session.time_to_buffered is None:
+            session.time_to_buffered = session.elapsed()
+            self.mark_first_audio()
+
+    def mark_position(self, position, duration):
+        session = self.session
+        if not session:
+            return
+        session.duration = duration or session.duration
+        session.furthest_position = max(session.furthest_position, position)
+        if position > 0:
+            self.mark_first_audio()
+
+    def mark_first_audio(self):
+        session = self.session
+        if session.time_to_first_audio is not None:
+            return
+        ttfa = session.elapsed()
+        session.time_to_first_audio = ttfa
+        with self.lock:
+            self.ttfa_count += 1
+            self.ttfa_sum += ttfa
+            for i, bound in enumerate(TTFA_BUCKETS):
+                if ttfa <= bound:
+                    self.ttfa_counts[i] += 1
+
+    def set_stream_size(self, stream_url, size):
+        session = self.session
+        if session and session.stream_url == stream_url:
+            session.stream_size = size
+
+    def add_bytes(self, stream_url, num_bytes):
+        with self.lock:
+            session = self.session
+            if session and session.stream_url == stream_url:
+                session.bytes_downloaded += num_bytes
+            else:
+                self.bytes_total += num_bytes
+
+    def finish(self, stalls):
+        with self.lock:
+            session = self.session
+            self.session = None
+            if session is None:
+                return
+            record = session.to_record(stalls)
+            if record["time_to_first_audio"] is None:
+                self.tracks_without_audio += 1
+            self.stalls_total += record["stalls"]
+            self.stalled_seconds_total += record["stalled_seconds"]
+            self.bytes_total += record["bytes_downloaded"]
+
+        try:
+            with open(self.jsonl_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            self.write_prometheus()
+        except OSError as e:
+            print(f"Error writing QoS metrics: {e}")
+
+    def write_prometheus(self):
+        with self.lock:
+            lines = [
+                "# HELP hearthis_tracks_started_total Tracks started by the player.",
+                "# TYPE hearthis_tracks_started_total counter",
+                f"hearthis_tracks_started_total {self.tracks_started}",
+                "# HELP hearthis_tracks_without_audio_total Tracks left before any audio was heard.",
+                "# TYPE hearthis_tracks_without_audio_total counter",
+                f"hearthis_tracks_without_audio_total {self.tracks_without_audio}",
+                "# HELP hearthis_time_to_first_audio_seconds Time from track selection to first audio.",
+                "# TYPE hearthis_time_to_first_audio_seconds histogram",
+            ]
+            for bound, count in zip(TTFA_BUCKETS, self.ttfa_counts):
+                lines.append(f'hearthis_time_to_first_audio_seconds_bucket{{le="{bound}"}} {count}')
+            lines += [
+                f'hearthis_time_to_first_audio_seconds_bucket{{le="+Inf"}} {self.ttfa_count}',
+                f"hearthis_time_to_first_audio_seconds_sum {self.ttfa_sum:.3f}",
+                f"hearthis_time_to_first_audio_seconds_count {self.ttfa_count}",
+                "# HELP hearthis_stalls_total Playback stalls.",
+                "# TYPE hearthis_stalls_total counter",
+                f"hearthis_stalls_total {self.stalls_total}",
+                "# HELP hearthis_stalled_seconds_total Time spent stalled.",
+                "# TYPE hearthis_stalled_seconds_total counter",
+                f"hearthis_stalled_seconds_total {self.stalled_seconds_total:.3f}",
+                "# HELP hearthis_downloaded_bytes_total Bytes downloaded for playback (estimated).",
+                "# TYPE hearthis_downloaded_bytes_total counter",
+                f"hearthis_downloaded_bytes_total {self.bytes_total}",
+            ]
+
+        tmp_path = f"{self.prom_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prom_path)
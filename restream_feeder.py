@@ -0,0 +1,221 @@
+import argparse
+import base64
+import os
+import queue
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import requests
+from hearthis_api import media_url
+from playlist_convert import read_entries, report_skipped
+
+CHUNK_SECONDS = 0.5
+BURST_SECONDS = 5.0
+
+
+class Prefetcher(threading.Thread):
+    def __init__(self, entries, spool_dir, tracks_ahead=2, max_bytes=512 * 1024 * 1024):
+        super().__init__(daemon=True)
+        self.entries = entries
+        self.spool_dir = spool_dir
+        self.ready = queue.Queue(maxsize=tracks_ahead)
+        self.max_bytes = max_bytes
+        self.spooled_bytes = 0
+        self.space = threading.Condition()
+        self.buffer = memoryview(bytearray(256 * 1024))
+
+    def run(self):
+        for entry in self.entries:
+            try:
+                path, size = self.download(entry["url"])
+            except (requests.RequestException, OSError) as e:
+                print(f"Error prefetching {entry['title']}: {e}", file=sys.stderr)
+                continue
+            self.ready.put((entry, path, size))
+        self.ready.put(None)
+
+    def download(self, url):
+        fd, path = tempfile.mkstemp(suffix=".part", dir=self.spool_dir)
+        size = 0
+        try:
+            with requests.get(media_url(url), stream=True, timeout=30) as response, os.fdopen(fd, "wb") as f:
+                response.raise_for_status()
+                # readinto a reused buffer keeps the copy count down on long mixes.
+                while True:
+                    n = response.raw.readinto(self.buffer)
+                    if not n:
+                        break
+                    f.write(self.buffer[:n])
+                    self.reserve(n, size)
+                    size += n
+        except BaseException:
+            self.release(size)
+            os.unlink(path)
+            raise
+        return path, size
+
+    def reserve(self, n, own):
+        # own: bytes this download already holds. Only other tracks can be waited out; once
+        # they have been played, a track larger than the whole limit is let through alone.
+        with self.space:
+            while self.spooled_bytes + n > self.max_bytes and self.spooled_bytes - own > 0:
+                self.space.wait()
+            self.spooled_bytes += n
+
+    def release(self, n):
+        with self.space:
+            self.spooled_bytes -= n
+            self.space.notify_all()
+
+
+class IcecastSource:
+    def __init__(self, host, port, mount, password, user="source", content_type="audio/mpeg", name=None):
+        self.host = host
+        self.port = port
+        self.mount = mount
+        self.password = password
+        self.user = user
+        self.content_type = content_type
+        self.name = name
+        self.sock = None
+        self.backoff = 1.0
+        self.air_time = 0.0
+
+    def connect(self):
+        credentials = base64.b64encode(f"{self.user}:{self.password}".encode()).decode()
+        headers = [
+            f"PUT {self.mount} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            f"Authorization: Basic {credentials}",
+            f"Content-Type: {self.content_type}",
+            "Ice-Public: 0",
+        ]
+        if self.name:
+            headers.append(f"Ice-Name: {self.name}")
+        sock = socket.create_connection((self.host, self.port), timeout=10)
+        try:
+            sock.sendall(("\r\n".join(headers) + "\r\n\r\n").encode())
+            response = b""
+            while b"\r\n\r\n" not in response:
+                data = sock.recv(4096)
+                if not data:
+                    raise ConnectionError("server closed the connection")
+                response += data
+            status = response.split(b"\r\n", 1)[0].decode(errors="replace")
+            if " 200 " not in f"{status} " and " 100 " not in f"{status} ":
+                raise ConnectionError(f"server refused source: {status}")
+        except BaseException:
+            sock.close()
+            raise
+        self.sock = sock
+        self.backoff = 1.0
+        # Audio clock: how far ahead of real time the mount has been fed.
+        self.air_time = time.monotonic()
+
+    def ensure_connected(self):
+        while self.sock is None:
+            try:
+                self.connect()
+                print(f"Connected to {self.host}:{self.port}{self.mount}")
+            except OSError as e:
+                delay = self.backoff * random.uniform(0.8, 1.2)
+                print(f"Error connecting to Icecast: {e}. Retrying in {delay:.1f}s", file=sys.stderr)
+                time.sleep(delay)
+                self.backoff = min(self.backoff * 2, 60.0)
+
+    def disconnect(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def send_file(self, f, size, bytes_per_second):
+        # Pace at the stream's own bitrate, at most BURST_SECONDS ahead, like a live encoder would.
+        offset = 0
+        chunk = max(4096, int(bytes_per_second * CHUNK_SECONDS))
+        while offset < size:
+            self.ensure_connected()
+            try:
+                sent = self.sock.sendfile(f, offset, min(chunk, size - offset))
+            except OSError as e:
+                print(f"Error sending to Icecast: {e}. Reconnecting", file=sys.stderr)
+                self.disconnect()
+                continue
+            if sent == 0:
+                self.disconnect()
+                continue
+            offset += sent
+            self.air_time = max(self.air_time, time.monotonic()) + sent / bytes_per_second
+            delay = self.air_time - time.monotonic() - BURST_SECONDS
+            if delay > 0:
+                time.sleep(delay)
+        return offset
+
+
+def feed(entries, source, spool_dir, tracks_ahead, max_bytes, bitrate):
+    prefetcher = Prefetcher(entries, spool_dir, tracks_ahead, max_bytes)
+    prefetcher.start()
+    stats = {"tracks": 0, "bytes": 0, "waited": 0.0}
+    source.ensure_connected()
+    while True:
+        waiting = time.monotonic()
+        item = prefetcher.ready.get()
+        waited = time.monotonic() - waiting
+        if item is None:
+            break
+        if waited > 1.0 and stats["tracks"]:
+            stats["waited"] += waited
+            print(f"Waited {waited:.1f}s for the next track to download", file=sys.stderr)
+
+        entry, path, size = item
+        duration = entry.get("duration")
+        bytes_per_second = size / duration if duration else bitrate * 1000 / 8
+        print(f"Now playing: {entry['title']} ({size / 1e6:.1f} MB)")
+        try:
+            with open(path, "rb") as f:
+                stats["bytes"] += source.send_file(f, size, bytes_per_second)
+        finally:
+            os.unlink(path)
+            prefetcher.release(size)
+        stats["tracks"] += 1
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed a playlist to an Icecast mount, downloading tracks ahead of air time.")
+    parser.add_argument("playlist")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--mount", default="/stream.mp3")
+    parser.add_argument("--user", default="source")
+    parser.add_argument("--password", default=os.environ.get("ICECAST_SOURCE_PASSWORD", "hackme"),
+                        help="source password (default: $ICECAST_SOURCE_PASSWORD)")
+    parser.add_argument("--content-type", default="audio/mpeg")
+    parser.add_argument("--name", help="stream name sent as Ice-Name")
+    parser.add_argument("--ahead", type=int, default=2, help="tracks to download ahead (default: 2)")
+    parser.add_argument("--buffer-mb", type=int, default=512, help="spool size limit in MB (default: 512)")
+    parser.add_argument("--bitrate", type=int, default=128, help="kbps used for pacing tracks without a duration")
+    parser.add_argument("--spool-dir", help="directory for downloaded tracks (default: a temp dir)")
+    parser.add_argument("--loop", action="store_true", help="start over when the playlist ends")
+    args = parser.parse_args()
+
+    source = IcecastSource(args.host, args.port, args.mount, args.password, args.user, args.content_type, args.name)
+    with tempfile.TemporaryDirectory(dir=args.spool_dir) as spool_dir:
+        try:
+            while True:
+                stats = feed(read_entries(args.playlist, on_error=report_skipped), source, spool_dir,
+                             args.ahead, args.buffer_mb * 1024 * 1024, args.bitrate)
+                print(f"Sent {stats['tracks']} tracks, {stats['bytes'] / 1e6:.1f} MB, "
+                      f"{stats['waited']:.1f}s waiting for downloads")
+                if not args.loop:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            source.disconnect()
+
+
+if __name__ == "__main__":
+    main()
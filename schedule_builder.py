@@ -0,0 +1,238 @@
+import argparse
+import bisect
+import random
+import sys
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from playlist_convert import WRITERS, detect_format, read_entries, report_skipped
+
+
+class Source:
+    def __init__(self, name, entries, weight=1.0):
+        self.name = name
+        self.weight = weight
+        self.entries = [entry for entry in entries if entry.get("duration")]
+        self.aired = 0
+        self.refill()
+
+    def refill(self):
+        # Sorted by duration so best-fit and "fits in the gap" are bisections.
+        order = sorted(range(len(self.entries)), key=lambda i: self.entries[i]["duration"])
+        self.durations = [self.entries[i]["duration"] for i in order]
+        self.order = order
+
+    def take(self, position):
+        self.durations.pop(position)
+        entry = self.entries[self.order.pop(position)]
+        if not self.order:
+            self.refill()
+        return entry
+
+
+def parse_source(spec):
+    path, _, weight = spec.partition(":")
+    if weight:
+        try:
+            return path, float(weight)
+        except ValueError:
+            pass
+    return spec, 1.0
+
+
+def entry_artist(entry):
+    return (entry.get("artist") or entry["title"].split(" - ")[0]).strip().lower()
+
+
+class ScheduleBuilder:
+    def __init__(self, sources, artist_gap=3, tolerance=60, best_fit_below=1800, probes=64, seed=None):
+        self.sources = [source for source in sources if source.entries]
+        self.artist_gap = artist_gap
+        self.tolerance = tolerance
+        self.best_fit_below = best_fit_below
+        self.probes = probes
+        self.recent_artists = deque(maxlen=artist_gap)
+        self.random = random.Random(seed)
+        self.total_weight = sum(source.weight for source in self.sources)
+
+    def pick_source(self, sources, total_aired):
+        # Smooth weighted selection: the source furthest behind its share of airtime goes next.
+        return max(sources, key=lambda s: (s.weight / self.total_weight) * (total_aired + 1) - s.aired)
+
+    def pick(self, source, remaining, limit):
+        fits = bisect.bisect_right(source.durations, limit)
+        if fits == 0:
+            return None
+        if limit == remaining and remaining <= self.best_fit_below:
+            # Close to the slot boundary: take the longest track that still fits.
+            candidates = range(fits - 1, max(-1, fits - 1 - self.probes), -1)
+        else:
+            candidates = (self.random.randrange(fits) for _ in range(self.probes))
+        for position in candidates:
+            if entry_artist(source.entries[source.order[position]]) not in self.recent_artists:
+                return position
+        return None
+
+    def overrun(self, source, remaining):
+        # Shortest track longer than the gap, for when nothing fits it.
+        start = bisect.bisect_right(source.durations, remaining)
+        stop = min(len(source.durations), start + self.probes)
+        for position in range(start, stop):
+            if entry_artist(source.entries[source.order[position]]) not in self.recent_artists:
+                return position
+        return None
+
+    def fill_slot(self, length, total_aired, span):
+        # span: seconds left in the whole schedule. Tracks that fit the slot come first; only when
+        # none does may the slot's first track be longer (a 90 minute mix in a 60 minute grid)
+        # and run on into the following slots.
+        remaining = length
+        slot = []
+        tried = set()
+        mode = "fit"
+        while remaining > self.tolerance and len(tried) < len(self.sources):
+            source = self.pick_source([s for s in self.sources if s.name not in tried], total_aired)
+            if mode == "overrun":
+                position = self.overrun(source, remaining)
+            else:
+                position = self.pick(source, remaining, span if mode == "span" else remaining)
+            if position is None:
+                tried.add(source.name)
+                if len(tried) == len(self.sources) and mode != "overrun":
+                    # Nothing fits the gap: rather than leave dead air, let a track run over the
+                    # boundary (or past the end of the schedule); the next slot starts later.
+                    mode = "span" if mode == "fit" and not slot else "overrun"
+                    tried.clear()
+                continue
+            entry = source.take(position)
+            duration = entry["duration"]
+            source.aired += duration
+            total_aired += duration
+            remaining -= duration
+            span -= duration
+            self.recent_artists.append(entry_artist(entry))
+            slot.append(entry)
+            tried.clear()
+            mode = "fit"
+        return slot, remaining
+
+    def build(self, start, slot_minutes, slots):
+        end = start + timedelta(minutes=slot_minutes * slots)
+        longest = int((end - start).total_seconds())
+        # Entries longer than the whole schedule can never be placed; they would also keep their
+        # source from ever running dry and refilling. Take them out and report them.
+        dropped = []
+        for source in self.sources:
+            dropped += [entry for entry in source.entries if entry["duration"] > longest]
+            source.entries = [entry for entry in source.entries if entry["duration"] <= longest]
+            source.refill()
+        self.sources = [source for source in self.sources if source.entries]
+        self.total_weight = sum(source.weight for source in self.sources)
+        when = start
+        boundary = start
+        schedule = []
+        report = []
+        total_aired = 0
+        for _ in range(slots):
+            slot_start = boundary
+            boundary += timedelta(minutes=slot_minutes)
+            # Negative or short when a long track from an earlier slot is still playing.
+            length = int((boundary - when).total_seconds())
+            slot, gap = self.fill_slot(length, total_aired, int((end - when).total_seconds()))
+            for entry in slot:
+                entry = dict(entry, start=when.isoformat(timespec="seconds"))
+                schedule.append(entry)
+                when += timedelta(seconds=entry["duration"])
+                total_aired += entry["duration"]
+            # gap is negative when the slot's last track runs on past its end.
+            report.append((slot_start, len(slot), gap))
+        return schedule, report, dropped
+
+
+def run_benchmark(candidates, days):
+    rng = random.Random(1)
+    sources = []
+    for name, weight in (("mixes", 2.0), ("tracks", 1.0)):
+        entries = [{
+            "title": f"artist{rng.randrange(2000)} - {name} {i}",
+            "url": f"https://hearthis.at/a/{name}-{i}/",
+            "duration": rng.choice((rng.randint(120, 600), rng.randint(1800, 7200))),
+        } for i in range(candidates // 2)]
+        sources.append(Source(name, entries, weight))
+
+    started = time.perf_counter()
+    builder = ScheduleBuilder(sources, seed=1)
+    schedule, report, dropped = builder.build(datetime(2024, 1, 1), 60, days * 24)
+    elapsed = time.perf_counter() - started
+    gaps = [max(gap, 0) for _, count, gap in report]
+    overruns = [-gap for _, count, gap in report if count and gap < 0]
+    starts = sum(1 for _, count, _ in report if count)
+    longest = max((entry["duration"] for entry in schedule), default=0)
+    print(f"{candidates} candidates, {days} day(s): {len(schedule)} tracks in {elapsed:.2f}s, "
+          f"max slot gap {max(gaps)}s, mean {sum(gaps) / len(gaps):.1f}s, "
+          f"{starts}/{len(report)} slots start a track, {len(overruns)} overrun (max {max(overruns, default=0)}s), "
+          f"longest scheduled {longest / 60:.0f} min, {len(dropped)} dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a time-slotted restream schedule from duration-annotated playlists.")
+    parser.add_argument("sources", nargs="*", help="playlist[:weight], e.g. mixes.m3u:2 tracks.m3u:1")
+    parser.add_argument("-o", "--output", help="schedule playlist (.m3u, .jsonl, ...)")
+    parser.add_argument("--start", help="schedule start, YYYY-MM-DD[THH:MM] (default: next midnight)")
+    parser.add_argument("--days", type=int, default=1, help="days to schedule (default: 1, 7 for a week)")
+    parser.add_argument("--slot-minutes", type=int, default=60, help="slot length (default: 60)")
+    parser.add_argument("--artist-gap", type=int, default=3, help="tracks before an artist may repeat (default: 3)")
+    parser.add_argument("--tolerance", type=int, default=60, help="seconds a slot may stay unfilled (default: 60)")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible schedules")
+    parser.add_argument("--benchmark", type=int, metavar="CANDIDATES", help="time a build over generated candidates")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.days)
+        return
+    if not args.sources or not args.output:
+        parser.error("sources and --output are required")
+
+    sources = []
+    for spec in args.sources:
+        path, weight = parse_source(spec)
+        entries = list(read_entries(path, on_error=report_skipped))
+        source = Source(path, entries, weight)
+        if len(source.entries) < len(entries):
+            print(f"{path}: skipping {len(entries) - len(source.entries)} entries without duration "
+                  f"(run metadata_backfill.py first)", file=sys.stderr)
+        sources.append(source)
+
+    if args.start:
+        start = datetime.fromisoformat(args.start)
+    else:
+        start = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    builder = ScheduleBuilder(sources, args.artist_gap, args.tolerance, seed=args.seed)
+    if not builder.sources:
+        parser.error("no entries with a duration in any source")
+    schedule, report, dropped = builder.build(start, args.slot_minutes, args.days * 24 * 60 // args.slot_minutes)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        writer = WRITERS[detect_format(args.output)](f)
+        for entry in schedule:
+            writer.write(entry)
+        writer.close()
+
+    for slot_start, count, gap in report:
+        if not count and gap <= 0:
+            flag = "  (previous track still playing)"
+        elif gap < 0:
+            flag = f"  <- runs {-gap}s into the next slot"
+        else:
+            flag = "" if gap <= args.tolerance else "  <- underfilled"
+        print(f"{slot_start:%Y-%m-%d %H:%M}  {count:3d} tracks  gap {gap:6d}s{flag}")
+    for entry in dropped[:10]:
+        print(f"Dropped {entry['title']}: {entry['duration'] // 60} min is longer than the whole schedule", file=sys.stderr)
+    if dropped:
+        print(f"{len(dropped)} entries longer than the schedule were left out", file=sys.stderr)
+    print(f"Wrote {len(schedule)} tracks to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from hearthis_api import search_page
+
+
+class SearchPager:
+    # Result pages keyed by (query, page). Futures are cached, not results, so a page
+    # that is still being prefetched is shared with the request that needs it.
+    def __init__(self, page_size=20, cache_pages=64, ttl=600, workers=2):
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pages = OrderedDict()
+
+    def get(self, query, page):
+        key = (query.casefold(), page)
+        future, created = self.pages.get(key, (None, 0))
+        if future is not None:
+            failed = future.done() and future.exception() is not None
+            if failed or time.monotonic() - created > self.ttl:
+                future = None
+        if future is None:
+            future = self.executor.submit(search_page, query, page, self.page_size, cache_ttl=self.ttl)
+            self.pages[key] = (future, time.monotonic())
+            while len(self.pages) > self.cache_pages:
+                self.pages.popitem(last=False)
+        self.pages.move_to_end(key)
+        return future
+
+    def prefetch(self, query, page):
+        self.get(query, page)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
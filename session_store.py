@@ -0,0 +1,205 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import tempfile
+import time
+import numpy as np
+from incremental_m3u import write_atomic
+
+MAGIC = b"HTSESS1\n"
+HEADER = struct.Struct("<I")
+MISSING = "\x01"
+NO_INT = np.iinfo(np.int64).min
+
+
+def flatten(track):
+    # One level of nesting ("user") becomes "user.username" style columns.
+    row = {}
+    for name, value in track.items():
+        if isinstance(value, dict) and name == "user":
+            for sub_name, sub_value in value.items():
+                row[f"user.{sub_name}"] = sub_value
+        else:
+            row[name] = value
+    return row
+
+
+def column_kind(values):
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return "i"
+    if all(isinstance(value, str) for value in present):
+        # Genres, artists and dates repeat a lot; store those once plus a code per row.
+        return "d" if len(set(values)) * 4 < len(values) else "s"
+    return "j"
+
+
+def encode_text(values):
+    # Text is one NUL-separated UTF-8 string, so loading it is a single decode and split.
+    return "\0".join(MISSING if value is None else value.replace("\0", "") for value in values).encode("utf-8")
+
+
+def decode_text(data, count):
+    values = data.decode("utf-8").split("\0") if count else []
+    return [None if value == MISSING else value for value in values]
+
+
+def encode_column(kind, values):
+    if kind == "i":
+        return np.array([NO_INT if value is None else value for value in values], dtype=np.int64).tobytes()
+    if kind == "d":
+        codes = {}
+        for value in values:
+            codes.setdefault(value, len(codes))
+        text = encode_text(list(codes))
+        return (HEADER.pack(len(codes)) + HEADER.pack(len(text)) + text
+                + np.array([codes[value] for value in values], dtype=np.uint32).tobytes())
+    if kind == "j":
+        values = [None if value is None else json.dumps(value, separators=(",", ":")) for value in values]
+    return encode_text(values)
+
+
+def decode_column(kind, data, rows):
+    if kind == "i":
+        return [None if value == NO_INT else value for value in np.frombuffer(data, dtype=np.int64).tolist()]
+    if kind == "d":
+        (count,) = HEADER.unpack_from(data, 0)
+        (length,) = HEADER.unpack_from(data, HEADER.size)
+        start = 2 * HEADER.size
+        uniques = decode_text(data[start:start + length], count)
+        return [uniques[code] for code in np.frombuffer(data, dtype=np.uint32, offset=start + length).tolist()]
+    values = decode_text(data, rows)
+    if kind == "j":
+        return [None if value is None else json.loads(value) for value in values]
+    return values
+
+
+def save_session(path, state, lists):
+    # state: small JSON-able dict; lists: {"name": [track dict, ...]} stored column by column.
+    meta = {"state": state, "lists": {}}
+    sections = []
+    offset = 0
+    for list_name, tracks in lists.items():
+        rows = [flatten(track) for track in tracks]
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        columns = []
+        for name in names:
+            values = [row.get(name) for row in rows]
+            kind = column_kind(values)
+            data = encode_column(kind, values)
+            columns.append([name, kind, offset, len(data)])
+            sections.append(data)
+            offset += len(data)
+        meta["lists"][list_name] = {"rows": len(rows), "columns": columns}
+
+    header = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+
+    def write(f):
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(header)))
+        f.write(header)
+        for data in sections:
+            f.write(data)
+
+    write_atomic(path, write, binary=True)
+
+
+def load_session(path):
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    with f:
+        if os.fstat(f.fileno()).st_size < len(MAGIC) + HEADER.size:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(MAGIC)] != MAGIC:
+                return None
+            (header_size,) = HEADER.unpack_from(mm, len(MAGIC))
+            start = len(MAGIC) + HEADER.size
+            try:
+                meta = json.loads(mm[start:start + header_size])
+            except ValueError:
+                return None
+            base = start + header_size
+
+            lists = {}
+            for list_name, info in meta["lists"].items():
+                columns = {}
+                for name, kind, offset, length in info["columns"]:
+                    columns[name] = decode_column(kind, mm[base + offset:base + offset + length], info["rows"])
+                lists[list_name] = build_rows(columns, info["rows"])
+    return meta["state"], lists
+
+
+def zip_rows(names, columns, count):
+    # Rows are assembled a column at a time; per-field Python work only happens where values are missing.
+    if not names:
+        return [{} for _ in range(count)]
+    rows = [dict(zip(names, values)) for values in zip(*columns)]
+    for name, values in zip(names, columns):
+        if None in values:
+            for row in rows:
+                if row[name] is None:
+                    del row[name]
+    return rows
+
+
+def build_rows(columns, count):
+    plain = [name for name in columns if not name.startswith("user.")]
+    nested = [name for name in columns if name.startswith("user.")]
+    rows = zip_rows(plain, [columns[name] for name in plain], count)
+    if nested:
+        users = zip_rows([name[5:] for name in nested], [columns[name] for name in nested], count)
+        for row, user in zip(rows, users):
+            if user:
+                row["user"] = user
+    return rows
+
+
+def run_benchmark(count):
+    rng = random.Random(1)
+    tracks = [{"id": str(rng.randrange(10 ** 7)), "title": f"artist{i % 500}-F#-140-200BPM-{rng.randrange(30, 120)}.0min",
+               "uri": f"https://api-v2.hearthis.at/artist{i % 500}/mix-{i}/",
+               "stream_url": f"https://hearthis.app/artist{i % 500}/mix-{i}/listen/?s=abc",
+               "duration": str(rng.randrange(120, 7200)), "genre": "Techno", "created_at": "2024-03-01 12:00:00",
+               "playback_count": str(rng.randrange(10 ** 5)),
+               "waveform_data": f"https://hearthis.at/_/wave_image/{i}.js",
+               "user": {"username": f"Artist {i % 500}", "permalink": f"artist{i % 500}"}} for i in range(count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.bin")
+        started = time.perf_counter()
+        save_session(path, {"current_page": 3}, {"playlist": tracks, "selected": tracks[:100]})
+        saved = time.perf_counter() - started
+        started = time.perf_counter()
+        state, lists = load_session(path)
+        loaded = time.perf_counter() - started
+        assert lists["playlist"] == tracks
+        json_size = len(json.dumps(tracks))
+        print(f"{count} tracks: saved in {saved * 1000:.0f} ms, loaded in {loaded * 1000:.0f} ms, "
+              f"{os.path.getsize(path) / 1024:.0f} KiB (JSON would be {json_size / 1024:.0f} KiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or benchmark player session snapshots.")
+    parser.add_argument("session", nargs="?", default=".session.bin")
+    parser.add_argument("--benchmark", type=int, metavar="TRACKS", help="time saving and loading a generated session")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+        return
+    snapshot = load_session(args.session)
+    if snapshot is None:
+        parser.error(f"no session in {args.session}")
+    state, lists = snapshot
+    print(json.dumps(state, indent=1))
+    for list_name, tracks in lists.items():
+        print(f"{list_name}: {len(tracks)} tracks")
+
+
+if __name__ == "__main__":
+    main()
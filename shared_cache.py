@@ -0,0 +1,151 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DECODE_ERRORS = (zlib.error, zstandard.ZstdError) if zstandard else (zlib.error,)
+SAFE_KEY = re.compile(r"[\w.-]{1,120}")
+
+
+def default_dir():
+    base = os.environ.get("HEARTHIS_CACHE_DIR")
+    if not base:
+        base = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "hearthis")
+    return Path(base)
+
+
+def zstd_compress(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def zstd_decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+# name -> (compress(data, level), default level)
+CODECS = {
+    "none": (lambda data, level: data, 0),
+    "zlib": (zlib.compress, 6),
+}
+if zstandard:
+    CODECS["zstd"] = (zstd_compress, 3)
+DEFAULT_CODEC = "zstd" if zstandard else "zlib"
+
+
+def decompress(data):
+    # Entries carry no header of their own: zstd frames and zlib streams are recognised by their
+    # first bytes, anything else (JSON written before compression existed) is returned as is.
+    if data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            return None
+        return zstd_decompress(data)
+    if len(data) > 1 and data[0] == 0x78 and (data[0] << 8 | data[1]) % 31 == 0:
+        return zlib.decompress(data)
+    return data
+
+
+class SharedCache:
+    # One directory shared by every player and tool on the host. Entries are published with
+    # an atomic rename, so readers need no lock; writers of the same key take a flock so a
+    # page is fetched once and the other processes find it on disk.
+    def __init__(self, namespace, directory=None, codec=None, level=None):
+        self.directory = Path(directory) if directory else default_dir() / namespace
+        codec = codec or os.environ.get("HEARTHIS_CACHE_CODEC") or DEFAULT_CODEC
+        if codec not in CODECS:
+            raise ValueError(f"unknown cache codec {codec!r} (available: {', '.join(CODECS)})")
+        self.codec = codec
+        self.compress, default_level = CODECS[codec]
+        if level is None:
+            level = int(os.environ.get("HEARTHIS_CACHE_LEVEL") or default_level)
+        self.level = level
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.lock_dir = self.directory / ".locks"
+
+    def name(self, key):
+        return key if SAFE_KEY.fullmatch(key) else hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return self.directory / self.name(key)
+
+    def get(self, key, max_age=None):
+        try:
+            with open(self.path(key), "rb") as f:
+                if max_age is not None and time.time() - os.fstat(f.fileno()).st_mtime > max_age:
+                    return None
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            return decompress(data)
+        except DECODE_ERRORS:
+            # A damaged entry is just a miss; the next set() replaces it.
+            return None
+
+    def set(self, key, data):
+        data = self.compress(data, self.level)
+        # A private temp name per writer; a shared "key.tmp" would let two writers interleave.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def delete(self, key):
+        try:
+            os.unlink(self.path(key))
+        except OSError:
+            pass
+
+    def age(self, key):
+        try:
+            return time.time() - self.path(key).stat().st_mtime
+        except OSError:
+            return None
+
+    @contextmanager
+    def lock(self, key):
+        if fcntl is None:
+            yield
+            return
+        self.lock_dir.mkdir(exist_ok=True)
+        with open(self.lock_dir / f"{self.name(key)}.lock", "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def get_or_fetch(self, key, fetch, max_age=None):
+        data = self.get(key, max_age)
+        if data is not None:
+            return data
+        with self.lock(key):
+            # Another process may have published it while we waited for the lock.
+            data = self.get(key, max_age)
+            if data is None:
+                data = fetch()
+                self.set(key, data)
+        return data
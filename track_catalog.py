@@ -0,0 +1,412 @@
+import argparse
+import json
+import queue
+import re
+import sqlite3
+import random
+import tempfile
+import threading
+import time
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    artist TEXT,
+    genre TEXT,
+    duration INTEGER,
+    stream_url TEXT,
+    music_key INTEGER,
+    bpm_low REAL,
+    bpm_high REAL,
+    length REAL,
+    data TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_duration ON tracks (duration);
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    title, artist, genre, content='tracks', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_fts (rowid, title, artist, genre) VALUES (new.id, new.title, new.artist, new.genre);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+    INSERT INTO tracks_fts (tracks_fts, rowid, title, artist, genre) VALUES ('delete', old.id, old.title, old.artist, old.genre);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE ON tracks BEGIN
+    INSERT INTO tracks_fts (tracks_fts, rowid, title, artist, genre) VALUES ('delete', old.id, old.title, old.artist, old.genre);
+    INSERT INTO tracks_fts (rowid, title, artist, genre) VALUES (new.id, new.title, new.artist, new.genre);
+END;
+"""
+
+UPSERT = """
+INSERT INTO tracks (id, title, artist, genre, duration, stream_url, music_key, bpm_low, bpm_high, length, data, seen_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    title = excluded.title,
+    artist = COALESCE(excluded.artist, tracks.artist),
+    genre = COALESCE(excluded.genre, tracks.genre),
+    duration = COALESCE(excluded.duration, tracks.duration),
+    stream_url = excluded.stream_url,
+    music_key = excluded.music_key,
+    bpm_low = excluded.bpm_low,
+    bpm_high = excluded.bpm_high,
+    length = excluded.length,
+    data = excluded.data,
+    seen_at = excluded.seen_at
+"""
+
+FILTER_RE = re.compile(r"(\w+):(\S+)")
+
+# Titles like "mtmn-F#-140-200BPM-90.0min" or "mtmn-G#-20-300-60.0min": key, BPM (or BPM range), length in minutes.
+TITLE_RE = re.compile(
+    r"(?:^|[\s_-])(?P<key>[A-G](?:#|b)?m?)-(?P<bpm_low>\d{2,3})(?:-(?P<bpm_high>\d{2,3}))?(?:\s*bpm)?"
+    r"-(?P<length>\d+(?:\.\d+)?)\s*min\b", re.IGNORECASE)
+BPM_RE = re.compile(r"(?P<bpm_low>\d{2,3})(?:\s*-\s*(?P<bpm_high>\d{2,3}))?\s*bpm\b", re.IGNORECASE)
+LENGTH_RE = re.compile(r"(?P<length>\d+(?:\.\d+)?)\s*min\b", re.IGNORECASE)
+KEY_RE = re.compile(r"^(?P<note>[A-G])(?P<accidental>#|b)?(?P<minor>m)?$", re.IGNORECASE)
+NOTES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+INDEX_COLUMNS = "id, COALESCE(music_key, -1), COALESCE(bpm_low, -1), COALESCE(bpm_high, -1), " \
+                "COALESCE(length, -1), COALESCE(duration, -1)"
+
+
+def key_code(name):
+    # Pitch class * 2 + minor flag, with flats folded onto sharps (Gb == F#).
+    match = KEY_RE.match(name or "")
+    if not match:
+        return None
+    pitch = NOTES[match["note"].upper()]
+    if match["accidental"] == "#":
+        pitch += 1
+    elif match["accidental"] == "b":
+        pitch -= 1
+    return (pitch % 12) * 2 + (1 if match["minor"] else 0)
+
+
+def parse_title(title):
+    match = TITLE_RE.search(title)
+    if match:
+        key = key_code(match["key"])
+    else:
+        key = None
+        match = BPM_RE.search(title)
+    bpm_low = bpm_high = length = None
+    if match and match["bpm_low"]:
+        bpm_low = float(match["bpm_low"])
+        bpm_high = float(match["bpm_high"]) if match["bpm_high"] else bpm_low
+        if bpm_high < bpm_low:
+            bpm_low, bpm_high = bpm_high, bpm_low
+    length_match = match if match and "length" in match.groupdict() else LENGTH_RE.search(title)
+    if length_match:
+        length = float(length_match["length"])
+    return key, bpm_low, bpm_high, length
+
+
+def track_row(track, now):
+    try:
+        track_id = int(track["id"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not track.get("title"):
+        return None
+    try:
+        duration = int(track["duration"])
+    except (KeyError, TypeError, ValueError):
+        duration = None
+    user = track.get("user") or {}
+    artist = user.get("username") or user.get("permalink") or track.get("artist")
+    key, bpm_low, bpm_high, length = parse_title(track["title"])
+    if length is None and duration:
+        length = duration / 60
+    return (track_id, track["title"], artist, track.get("genre"), duration, track.get("stream_url"),
+            key, bpm_low, bpm_high, length, json.dumps(track, separators=(",", ":")), now)
+
+
+def parse_range(value):
+    # "30-90", ">30", "<90" or "30" -> (low, high), None for an open end
+    if value.startswith(">"):
+        return float(value[1:]), None
+    if value.startswith("<"):
+        return None, float(value[1:])
+    low, _, high = value.partition("-")
+    return float(low) if low else None, float(high) if high else None
+
+
+class TitleIndex:
+    # Column arrays over the whole catalog, ordered newest first, so that key/BPM/length
+    # filters are a few vectorised comparisons instead of a table scan in SQLite.
+    def __init__(self, rows):
+        table = np.array(rows, dtype=np.float64).reshape(-1, 6)
+        self.ids = table[:, 0].astype(np.int64)
+        self.keys = table[:, 1].astype(np.int16)
+        self.bpm_low = table[:, 2]
+        self.bpm_high = table[:, 3]
+        self.length = table[:, 4]
+        self.duration = table[:, 5]
+
+    def query(self, key=None, min_bpm=None, max_bpm=None, min_length=None, max_length=None,
+              min_duration=None, max_duration=None):
+        mask = np.ones(len(self.ids), dtype=bool)
+        if key is not None:
+            # A key without "m" matches both modes of that root.
+            mask &= (self.keys == key) if key % 2 else (self.keys >> 1 == key >> 1)
+        if min_bpm is not None or max_bpm is not None:
+            # Titles carry BPM ranges; a track matches when its range overlaps the wanted one.
+            mask &= self.bpm_high >= 0
+            if min_bpm is not None:
+                mask &= self.bpm_high >= min_bpm
+            if max_bpm is not None:
+                mask &= self.bpm_low <= max_bpm
+        for values, low, high in ((self.length, min_length, max_length), (self.duration, min_duration, max_duration)):
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= (values >= 0) & (values <= high)
+        return self.ids[mask]
+
+
+def parse_query(text):
+    # "dub artist:mtmn genre:techno dur:30-90 key:F bpm:120-140 len:>30" -> search() keyword arguments
+    # (dur: is the API duration, len: the length in the title or else the duration, both in minutes)
+    query = {}
+    for name, value in FILTER_RE.findall(text):
+        if name in ("artist", "genre"):
+            query[name] = value
+        elif name == "key":
+            query["key"] = value
+        elif name in ("dur", "duration"):
+            low, high = parse_range(value)
+            query["min_duration"] = low * 60 if low is not None else None
+            query["max_duration"] = high * 60 if high is not None else None
+        elif name in ("len", "length"):
+            query["min_length"], query["max_length"] = parse_range(value)
+        elif name == "bpm":
+            query["min_bpm"], query["max_bpm"] = parse_range(value)
+            if "-" not in value[1:] and value[0] not in "<>":
+                query["max_bpm"] = query["min_bpm"]
+    words = FILTER_RE.sub("", text).split()
+    if words:
+        query["text"] = " ".join(words)
+    return query
+
+
+class TrackCatalog:
+    def __init__(self, path="catalog.sqlite", flush_interval=1.0, batch_size=500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = queue.Queue()
+
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+        self.upgrade(conn)
+        conn.close()
+        self.reader = self.connect()
+        self.reader_lock = threading.Lock()
+        self.generation = 0
+        self.index = None
+        self.index_generation = -1
+
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def upgrade(self, conn):
+        # Catalogs created before the title columns existed get them added and filled in once.
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tracks)")}
+        if "music_key" in columns:
+            return
+        with conn:
+            for column, kind in (("music_key", "INTEGER"), ("bpm_low", "REAL"), ("bpm_high", "REAL"), ("length", "REAL")):
+                conn.execute(f"ALTER TABLE tracks ADD COLUMN {column} {kind}")
+            rows = conn.execute("SELECT id, title, duration FROM tracks").fetchall()
+            updates = []
+            for track_id, title, duration in rows:
+                key, bpm_low, bpm_high, length = parse_title(title)
+                if length is None and duration:
+                    length = duration / 60
+                updates.append((key, bpm_low, bpm_high, length, track_id))
+            conn.executemany("UPDATE tracks SET music_key = ?, bpm_low = ?, bpm_high = ?, length = ? WHERE id = ?",
+                             updates)
+
+    def ingest(self, tracks):
+        # Called from the GUI thread; rows are written in batches by the writer thread.
+        if isinstance(tracks, list) and tracks:
+            self.pending.put(tracks)
+
+    def write_loop(self):
+        conn = self.connect()
+        while True:
+            tracks = self.pending.get()
+            stop = tracks is None
+            batch = []
+            rows = 0
+            deadline = time.monotonic() + self.flush_interval
+            while not stop:
+                batch.append(tracks)
+                rows += len(tracks)
+                if rows >= self.batch_size:
+                    break
+                try:
+                    tracks = self.pending.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                stop = tracks is None
+            self.write(conn, batch)
+            if stop:
+                conn.close()
+                return
+
+    def write(self, conn, batch):
+        now = time.time()
+        rows = [track_row(track, now) for tracks in batch for track in tracks if isinstance(track, dict)]
+        rows = [row for row in rows if row]
+        if not rows:
+            return
+        try:
+            with conn:
+                conn.executemany(UPSERT, rows)
+        except sqlite3.Error as e:
+            print(f"Error writing to track catalog: {e}")
+            return
+        self.generation += 1
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join(timeout=10)
+        self.reader.close()
+
+    def title_index(self):
+        # Rebuilt only after the writer has committed something new.
+        generation = self.generation
+        if self.index is None or self.index_generation != generation:
+            with self.reader_lock:
+                rows = self.reader.execute(f"SELECT {INDEX_COLUMNS} FROM tracks ORDER BY seen_at DESC").fetchall()
+            self.index = TitleIndex(rows)
+            self.index_generation = generation
+        return self.index
+
+    def search(self, text=None, artist=None, genre=None, min_duration=None, max_duration=None, limit=500,
+               key=None, min_bpm=None, max_bpm=None, min_length=None, max_length=None):
+        fts_terms = []
+        if text:
+            # Quote every word so user input cannot form FTS syntax; trailing * gives prefix matching.
+            fts_terms += ['"{}"*'.format(word.replace('"', '""')) for word in text.split()]
+        if artist:
+            fts_terms.append('artist:"{}"*'.format(artist.replace('"', '""')))
+        if genre:
+            fts_terms.append('genre:"{}"*'.format(genre.replace('"', '""')))
+
+        if key is not None and not isinstance(key, int):
+            key = key_code(key)
+            if key is None:
+                return []
+        if key is None and min_bpm is None and max_bpm is None and min_length is None and max_length is None:
+            return self.search_sql(fts_terms, min_duration, max_duration, limit)
+
+        ids = self.title_index().query(key, min_bpm, max_bpm, min_length, max_length, min_duration, max_duration)
+        if fts_terms:
+            with self.reader_lock:
+                matches = self.reader.execute("SELECT rowid FROM tracks_fts WHERE tracks_fts MATCH ?",
+                                              (" AND ".join(fts_terms),)).fetchall()
+            ids = ids[np.isin(ids, np.array([rowid for (rowid,) in matches], dtype=np.int64))]
+        ids = ids[:limit].tolist()
+        if not ids:
+            return []
+        with self.reader_lock:
+            rows = []
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows += self.reader.execute(f"SELECT id, data FROM tracks WHERE id IN ({','.join('?' * len(chunk))})",
+                                            chunk).fetchall()
+        data = dict(rows)
+        return [json.loads(data[track_id]) for track_id in ids if track_id in data]
+
+    def search_sql(self, fts_terms, min_duration, max_duration, limit):
+        clauses = []
+        params = []
+        if fts_terms:
+            clauses.append("tracks.id IN (SELECT rowid FROM tracks_fts WHERE tracks_fts MATCH ?)")
+            params.append(" AND ".join(fts_terms))
+        if min_duration is not None:
+            clauses.append("duration >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            clauses.append("duration <= ?")
+            params.append(max_duration)
+
+        sql = "SELECT data FROM tracks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY seen_at DESC LIMIT ?"
+        params.append(limit)
+        with self.reader_lock:
+            rows = self.reader.execute(sql, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def count(self):
+        with self.reader_lock:
+            return self.reader.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+
+def run_benchmark(count):
+    rng = random.Random(1)
+    roots = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+    keys = roots + [f"{root}m" for root in roots]
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = TrackCatalog(f"{tmp}/catalog.sqlite", batch_size=5000)
+        for start in range(0, count, 5000):
+            batch = []
+            for i in range(start, min(start + 5000, count)):
+                low = rng.randrange(60, 180)
+                length = rng.choice((30, 45, 60, 90, 120))
+                batch.append({"id": i + 1, "title": f"artist{rng.randrange(500)}-{rng.choice(keys)}-{low}-"
+                                                   f"{low + rng.randrange(0, 60)}BPM-{length}.0min",
+                              "duration": length * 60 + rng.randrange(-60, 60), "genre": "techno"})
+            catalog.ingest(batch)
+        catalog.close()
+
+        catalog = TrackCatalog(f"{tmp}/catalog.sqlite")
+        started = time.perf_counter()
+        catalog.title_index()
+        print(f"{count} tracks: index built in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for query in ("key:F bpm:120-140 len:>30", "key:G# len:<45", "bpm:128", "techno key:Am bpm:>150",
+                      "key:F#m len:60"):
+            started = time.perf_counter()
+            results = catalog.search(**parse_query(query))
+            print(f"{query!r}: {len(results)} results in {(time.perf_counter() - started) * 1000:.1f} ms")
+        catalog.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the local catalog of tracks seen by the player.")
+    parser.add_argument("query", nargs="*",
+                        help='words plus filters, e.g. dub artist:mtmn genre:techno dur:30-90 key:F bpm:120-140 len:>30')
+    parser.add_argument("--catalog", default="catalog.sqlite")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--benchmark", type=int, metavar="TRACKS", help="time key/BPM/length queries over generated tracks")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+        return
+
+    catalog = TrackCatalog(args.catalog)
+    started = time.perf_counter()
+    results = catalog.search(limit=args.limit, **parse_query(" ".join(args.query)))
+    elapsed = (time.perf_counter() - started) * 1000
+    for track in results:
+        print(f"{track.get('duration') or '?':>6}s  {track['title']}  {track.get('stream_url', '')}")
+    print(f"{len(results)} of {catalog.count()} tracks in {elapsed:.1f} ms")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,9 @@
 #!/bin/bash
 
-input_file=playlist.txt
-output_file=playlist.m3u
+input_file=${1:-playlist.txt}
+output_file=${2:-playlist.m3u}
 
-# Tworzenie nowego pliku M3U lub nadpisanie istniejącego
-echo "#EXTM3U" > "$output_file"
-
-# Pętla odczytująca każdą linię z pliku wejściowego
-while IFS= read -r line; do
-    # Wyciągnięcie nazwy streamu i adresu URL
-    stream_name=$(echo "$line" | cut -d$'\t' -f1)
-    stream_url=$(echo "$line" | cut -d$'\t' -f2-)
-
-    # Dodanie wpisu do pliku M3U
-    echo "#EXTINF:-1,$stream_name" >> "$output_file"
-    echo "$stream_url" >> "$output_file"
-done < "$input_file"
+# Konwersja jednym procesem zamiast dwóch wywołań cut na każdą linię
+python3 "$(dirname "$0")/playlist_convert.py" "$input_file" "$output_file" --from txt --to m3u || exit 1
 
 echo "Plik M3U został wygenerowany: $output_file"
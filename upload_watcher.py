@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from artist_export import APPENDABLE_FORMATS
+from hearthis_api import RateLimiter, artist_feed_page, track_to_entry
+from incremental_m3u import load_checkpoint, write_atomic
+from playlist_convert import WRITERS, detect_format
+
+
+def track_id(track):
+    try:
+        return int(track.get("id"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def poll_artist(artist, state, page_size=10, max_pages=5, limiter=None):
+    # Feeds are newest first, so everything above the high-water mark is new and
+    # the first known id means we can stop without reading further.
+    high_water = state.get("last_id") if state else None
+    new_tracks = []
+    for page in range(1, max_pages + 1):
+        tracks = artist_feed_page(artist, "tracks", page, page_size, limiter=limiter)
+        reached_known = False
+        for track in tracks:
+            if not isinstance(track, dict):
+                continue
+            if high_water is not None and track_id(track) <= high_water:
+                reached_known = True
+                break
+            new_tracks.append(track)
+        if reached_known or high_water is None or len(tracks) < page_size:
+            break
+    return new_tracks
+
+
+def watch_once(artists, output, state_path, page_size, max_pages, parallel, rate, seed_only):
+    fmt = detect_format(output)
+    if fmt not in APPENDABLE_FORMATS:
+        raise ValueError(f"Appending needs one of {', '.join(APPENDABLE_FORMATS)}, not {fmt}")
+    state = load_checkpoint(state_path) or {}
+    limiter = RateLimiter(rate)
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = {artist: executor.submit(poll_artist, artist, state.get(artist), page_size, max_pages, limiter)
+                   for artist in artists}
+
+    added = 0
+    exists = os.path.exists(output)
+    with open(output, "a", encoding="utf-8") as f:
+        writer = WRITERS[fmt](f, header=not exists)
+        for artist, future in futures.items():
+            try:
+                tracks = future.result()
+            except requests.RequestException as e:
+                print(f"Error polling {artist}: {e}", file=sys.stderr)
+                continue
+            if not tracks:
+                continue
+            first_seen = artist not in state
+            state[artist] = {"last_id": max(track_id(track) for track in tracks), "checked": time.time()}
+            if first_seen and seed_only:
+                # First sight of an artist only sets the mark; use artist_export.py for back catalogs.
+                continue
+            for track in reversed(tracks):
+                if track.get("stream_url"):
+                    entry = track_to_entry(track)
+                    entry.setdefault("artist", artist)
+                    writer.write(entry)
+                    added += 1
+            print(f"{artist}: {len(tracks)} new")
+        writer.close()
+    write_atomic(state_path, lambda sf: json.dump(state, sf, indent=1))
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append new uploads of followed artists to a playlist.")
+    parser.add_argument("artists", nargs="*")
+    parser.add_argument("-o", "--output", required=True, help="playlist to append to (.txt, .m3u or .jsonl)")
+    parser.add_argument("--artists-file", help="file with one artist username per line")
+    parser.add_argument("--state", default=".watch_state.json", help="high-water marks (default: .watch_state.json)")
+    parser.add_argument("--page-size", type=int, default=10, help="tracks per poll request (default: 10)")
+    parser.add_argument("--max-pages", type=int, default=5, help="pages to read when an artist posted a lot (default: 5)")
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second (default: 10)")
+    parser.add_argument("--include-first", action="store_true",
+                        help="append the newest page of artists seen for the first time instead of only marking them")
+    parser.add_argument("--interval", type=float, metavar="MINUTES", help="keep polling every MINUTES")
+    args = parser.parse_args()
+
+    artists = list(args.artists)
+    if args.artists_file:
+        with open(args.artists_file) as f:
+            artists += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not artists:
+        parser.error("no artists given")
+
+    while True:
+        started = time.perf_counter()
+        try:
+            added = watch_once(artists, args.output, args.state, args.page_size, args.max_pages,
+                               args.parallel, args.rate, not args.include_first)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Polled {len(artists)} artists, added {added} tracks in {time.perf_counter() - started:.1f}s")
+        if not args.interval:
+            break
+        time.sleep(args.interval * 60)
+
+
+if __name__ == "__main__":
+    main()
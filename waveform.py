@@ -0,0 +1,46 @@
+import os
+from pathlib import Path
+import numpy as np
+import requests
+
+
+class WaveformCache:
+    def __init__(self, cache_dir=".waveform_cache"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+
+    def get(self, track_id):
+        cache_file = self.cache_dir / f"{track_id}.u8"
+        if cache_file.exists():
+            return np.fromfile(cache_file, dtype=np.uint8)
+        return None
+
+    def set(self, track_id, samples):
+        cache_file = self.cache_dir / f"{track_id}.u8"
+        tmp_file = cache_file.with_suffix(".tmp")
+        samples.astype(np.uint8).tofile(tmp_file)
+        os.replace(tmp_file, cache_file)
+
+
+def fetch_waveform(url, timeout=20):
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    values = np.asarray(response.json(), dtype=np.float32)
+    # One unsigned byte per sample is plenty for drawing.
+    peak = values.max() if values.size else 0
+    if peak > 0:
+        values = values * (255.0 / peak)
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+
+def downsample(samples, width):
+    # Peak per pixel column, scaled to 0..1.
+    if width <= 0 or samples is None or samples.size == 0:
+        return np.zeros(0, dtype=np.float32)
+    if samples.size >= width:
+        edges = np.arange(width) * samples.size // width
+        columns = np.maximum.reduceat(samples, edges)
+    else:
+        positions = np.linspace(0, samples.size - 1, width)
+        columns = np.interp(positions, np.arange(samples.size), samples)
+    return columns.astype(np.float32) / 255.0